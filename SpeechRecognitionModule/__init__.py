@@ -1,3 +1,12 @@
-from .transcribe import speech2text
+from .backends import ASR_BACKENDS, SPELLING_BACKENDS
+from .batching import DynamicBatcher
+from .metrics import Instrumentation, JsonTraceSink, LoggingSink, MetricsSink, PrometheusTextSink
+from .realtime import RealtimeTranscription, TranscriptSegment
+from .spelling_correction import CorrectionGate
+from .timestamps import TimestampedTranscript
+from .transcribe import Transcriber, TranscriptionResult, speech2text
+from .vad import SpeechFilter
 
-__all__ = ["speech2text"]
\ No newline at end of file
+__all__ = ["Transcriber", "TranscriptionResult", "speech2text", "ASR_BACKENDS", "SPELLING_BACKENDS", "DynamicBatcher",
+           "RealtimeTranscription", "TranscriptSegment", "TimestampedTranscript", "SpeechFilter", "CorrectionGate",
+           "Instrumentation", "MetricsSink", "LoggingSink", "JsonTraceSink", "PrometheusTextSink"]
\ No newline at end of file
@@ -0,0 +1,253 @@
+"""
+Модуль содержит бэкенды инференса для развертывания на CPU: динамическое int8 квантование моделей Nemo и T5,
+энкодер conformer, экспортированный в TorchScript или ONNX (выполняется в ONNX Runtime), и T5 в ONNX Runtime.
+Экспортированные модели сохраняются на диск и переиспользуются при следующих запусках.
+"""
+import os
+import shutil
+import tempfile
+from typing import List, Optional
+
+import torch
+
+ASR_BACKENDS = ("eager", "int8", "torchscript", "onnx")
+SPELLING_BACKENDS = ("eager", "int8", "onnx")
+DEFAULT_ARTIFACTS_DIR = os.path.join(os.path.expanduser("~"), ".cache", "SpeechRecognitionModule", "backends")
+
+
+def set_num_threads(num_threads: Optional[int]):
+    """
+    Число потоков для вычислений на CPU (torch, а также ONNX Runtime для моделей, загружаемых после вызова).
+    Args:
+        num_threads (int): Число потоков. None - значение по умолчанию (все ядра).
+    """
+    if num_threads is not None:
+        torch.set_num_threads(num_threads)
+
+
+def validate_backends(device: torch.device, asr_backend: str = "eager", spelling_backend: str = "eager"):
+    """
+    Проверка бэкендов до загрузки моделей: int8, TorchScript и ONNX бэкенды работают только на CPU.
+    Args:
+        device (torch.device): Устройство моделей.
+        asr_backend (str): Бэкенд Nemo.
+        spelling_backend (str): Бэкенд T5.
+    """
+    if asr_backend not in ASR_BACKENDS:
+        raise ValueError(f"Unknown ASR backend: {asr_backend}. Expected one of {ASR_BACKENDS}")
+    if spelling_backend not in SPELLING_BACKENDS:
+        raise ValueError(f"Unknown spelling correction backend: {spelling_backend}. "
+                         f"Expected one of {SPELLING_BACKENDS}")
+    for backend in (asr_backend, spelling_backend):
+        if backend != "eager" and torch.device(device).type != "cpu":
+            raise ValueError(f"Backend {backend} is supported only on CPU, got device {device}.")
+
+
+def get_backend(model) -> str:
+    """
+    Бэкенд, подготовленный для модели функциями этого модуля (входит в ключи кэша транскрипций).
+    """
+    return getattr(model, "inference_backend", "eager")
+
+
+def quantize_int8(module: torch.nn.Module) -> torch.nn.Module:
+    """
+    Динамическое int8 квантование линейных слоев и LSTM (веса хранятся в int8, активации квантуются на лету).
+    """
+    quantized_types = {torch.nn.Linear, torch.nn.LSTM}
+    if type(module) in quantized_types:  # quantize_dynamic заменяет только вложенные модули
+        return torch.quantization.quantize_dynamic(torch.nn.Sequential(module), quantized_types, dtype=torch.qint8)[0]
+    return torch.quantization.quantize_dynamic(module, quantized_types, dtype=torch.qint8)
+
+
+def _get_artifact_path(artifacts_dir: Optional[str], model_name: str, file_name: str) -> str:
+    """
+    Путь до экспортированной модели. В путь входят имя модели и версия torch, так как артефакты
+    TorchScript и ONNX зависят от версии экспортера.
+    """
+    artifacts_dir = artifacts_dir if artifacts_dir is not None else DEFAULT_ARTIFACTS_DIR
+    return os.path.join(artifacts_dir, model_name.replace("/", "--"), f"torch-{torch.__version__}", file_name)
+
+
+def _make_onnx_session(path: str, num_threads: Optional[int]):
+    """
+    Сессия ONNX Runtime для CPU.
+    """
+    import onnxruntime
+
+    session_options = onnxruntime.SessionOptions()
+    if num_threads is not None:
+        session_options.intra_op_num_threads = num_threads
+    session_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return onnxruntime.InferenceSession(path, session_options, providers=["CPUExecutionProvider"])
+
+
+class ExportedEncoder(torch.nn.Module):
+    """
+    Замена энкодера модели Nemo на экспортированный (TorchScript или ONNX). Интерфейс совпадает с энкодером
+    conformer: forward(audio_signal, length) -> (outputs, encoded_lengths), поэтому препроцессор и декодирование
+    RNNT модели остаются без изменений.
+    """
+
+    def __init__(self, path: str, backend: str, num_threads: Optional[int] = None):
+        """
+        Args:
+            path (str): Путь до экспортированного энкодера.
+            backend (str): "torchscript" или "onnx".
+            num_threads (int): Число потоков ONNX Runtime.
+        """
+        super().__init__()
+        self.backend = backend
+        if backend == "torchscript":
+            self.script = torch.jit.load(path, map_location="cpu").eval()
+        else:
+            self.session = _make_onnx_session(path, num_threads)
+            self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+
+    def forward(self, audio_signal: torch.Tensor, length: torch.Tensor):
+        if self.backend == "torchscript":
+            return self.script(audio_signal, length)
+        outputs = self.session.run(None, {self.input_names[0]: audio_signal.cpu().numpy(),
+                                          self.input_names[1]: length.cpu().numpy()})
+        return torch.from_numpy(outputs[0]), torch.from_numpy(outputs[1])
+
+    def freeze(self):
+        """
+        Аналог NeuralModule.freeze (вызывается в EncDecRNNTModel.transcribe при распознавании по путям до файлов).
+        Обучаемых параметров у экспортированного энкодера нет, поэтому он только переводится в режим eval.
+        """
+        self.eval()
+
+    def unfreeze(self):
+        """
+        Аналог NeuralModule.unfreeze. Экспортированный энкодер всегда выполняется в режиме инференса.
+        """
+
+
+def _export_encoder(model, path: str):
+    """
+    Экспорт энкодера Nemo (Exportable.export, формат определяется расширением) с атомарной записью на диск.
+    """
+    if not hasattr(model.encoder, "export"):
+        raise ValueError(f"Encoder {type(model.encoder).__name__} does not support export.")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    root, extension = os.path.splitext(path)
+    tmp_path = f"{root}.{os.getpid()}.tmp{extension}"
+    try:
+        model.encoder.export(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def prepare_asr_model(model,
+                      backend: str = "eager",
+                      model_name: str = "asr",
+                      artifacts_dir: Optional[str] = None,
+                      num_threads: Optional[int] = None):
+    """
+    Подготовка модели Nemo к инференсу на выбранном бэкенде (модель изменяется на месте).
+    Args:
+        model (EncDecRNNTBPEModel): Модель Nemo в режиме eval на CPU.
+        backend (str): "eager", "int8" (квантование энкодера, декодера и joint), "torchscript" или "onnx"
+                       (энкодер экспортируется один раз и загружается из artifacts_dir).
+        model_name (str): Имя модели (для пути до экспортированного энкодера).
+        artifacts_dir (str): Директория экспортированных моделей.
+        num_threads (int): Число потоков ONNX Runtime.
+    Returns: Модель, у которой атрибут inference_backend равен backend.
+    """
+    if backend not in ASR_BACKENDS:
+        raise ValueError(f"Unknown ASR backend: {backend}. Expected one of {ASR_BACKENDS}")
+
+    if backend == "int8":
+        for name in ("encoder", "decoder", "joint"):
+            if isinstance(getattr(model, name, None), torch.nn.Module):
+                setattr(model, name, quantize_int8(getattr(model, name)))
+    elif backend in ("torchscript", "onnx"):
+        path = _get_artifact_path(artifacts_dir, model_name, "encoder.ts" if backend == "torchscript"
+                                  else "encoder.onnx")
+        if not os.path.exists(path):
+            _export_encoder(model, path)
+        model.encoder = ExportedEncoder(path, backend, num_threads=num_threads)
+    model.inference_backend = backend
+    return model
+
+
+def _export_spelling_model(model_name: str, path: str):
+    """
+    Экспорт T5 в ONNX (optimum) во временную директорию и ее атомарное переименование в path,
+    чтобы одновременно запущенные процессы не загрузили недописанную модель.
+    """
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = tempfile.mkdtemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True).save_pretrained(tmp_path)
+        try:
+            os.replace(tmp_path, path)
+        except OSError:
+            if not os.path.isdir(path):  # иначе модель уже экспортирована другим процессом
+                raise
+    finally:
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+
+
+def prepare_spelling_model(model,
+                           backend: str = "eager",
+                           model_name: str = "spelling",
+                           artifacts_dir: Optional[str] = None,
+                           num_threads: Optional[int] = None):
+    """
+    Подготовка модели T5 к инференсу на выбранном бэкенде.
+    Args:
+        model (PreTrainedModel): Модель T5 в режиме eval на CPU (для "onnx" не используется и может быть None).
+        backend (str): "eager", "int8" (квантование линейных слоев) или "onnx" (ONNX Runtime через optimum;
+                       модель model_name экспортируется один раз и загружается из artifacts_dir).
+        model_name (str): Имя модели на HuggingFace Hub.
+        artifacts_dir (str): Директория экспортированных моделей.
+        num_threads (int): Число потоков ONNX Runtime.
+    Returns: Модель, у которой атрибут inference_backend равен backend.
+    """
+    if backend not in SPELLING_BACKENDS:
+        raise ValueError(f"Unknown spelling correction backend: {backend}. Expected one of {SPELLING_BACKENDS}")
+
+    if backend == "int8":
+        model = quantize_int8(model)
+    elif backend == "onnx":
+        import onnxruntime
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+        session_options = onnxruntime.SessionOptions()
+        if num_threads is not None:
+            session_options.intra_op_num_threads = num_threads
+        path = _get_artifact_path(artifacts_dir, model_name, "onnx")
+        if not os.path.exists(path):
+            _export_spelling_model(model_name, path)
+        model = ORTModelForSeq2SeqLM.from_pretrained(path, session_options=session_options,
+                                                     provider="CPUExecutionProvider")
+    model.inference_backend = backend
+    return model
+
+
+def word_error_rate(references: List[str], hypotheses: List[str]) -> float:
+    """
+    WER (расстояние Левенштейна по словам, деленное на число слов в эталонах) для проверки
+    совпадения результатов бэкендов.
+    """
+    errors = 0
+    num_words = 0
+    for reference, hypothesis in zip(references, hypotheses):
+        reference_words, hypothesis_words = reference.split(), hypothesis.split()
+        distances = list(range(len(hypothesis_words) + 1))
+        for i, reference_word in enumerate(reference_words, start=1):
+            prev_diagonal, distances[0] = distances[0], i
+            for j, hypothesis_word in enumerate(hypothesis_words, start=1):
+                prev_diagonal, distances[j] = distances[j], min(distances[j] + 1,
+                                                                distances[j - 1] + 1,
+                                                                prev_diagonal + (reference_word != hypothesis_word))
+        errors += distances[-1]
+        num_words += len(reference_words)
+    return errors / num_words if num_words else float(errors > 0)
@@ -0,0 +1,125 @@
+"""
+Модуль содержит динамический batcher для асинхронного API: элементы (чанки аудио или предложения) от многих
+одновременных запросов собираются в общие batch-и с ограничением на размер batch-а и время ожидания, batch
+обрабатывается моделью в отдельном потоке (не блокируя event loop), а результаты возвращаются каждому вызывающему.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+
+class DynamicBatcher:
+    """
+    Динамический batcher поверх asyncio. Batch отправляется на обработку, когда набрано max_batch_size элементов
+    или прошло max_wait_ms с момента поступления первого элемента batch-а.
+    Batch-и обрабатываются последовательно в одном выделенном потоке, поэтому модель не используется
+    из нескольких потоков одновременно.
+    """
+
+    def __init__(self,
+                 process_batch: Callable[[List[Any]], List[Any]],
+                 max_batch_size: int = 16,
+                 max_wait_ms: float = 10.0,
+                 name: str = "batcher"):
+        """
+        Инициализация batcher-а.
+        Args:
+            process_batch (Callable): Функция, обрабатывающая список элементов и возвращающая список результатов
+                                      (в том же порядке). Выполняется в отдельном потоке.
+            max_batch_size (int): Максимальный размер batch-а.
+            max_wait_ms (float): Максимальное время ожидания заполнения batch-а в миллисекундах.
+            name (str): Название batcher-а (префикс имени потока).
+        """
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.name = name
+        self.num_batches = 0
+        self.num_items = 0
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def _ensure_worker(self):
+        """
+        Запуск фоновой задачи, собирающей batch-и, в текущем event loop (при первом вызове или смене loop-а).
+        """
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, item: Any) -> Any:
+        """
+        Добавление элемента в очередной batch.
+        Returns: Результат обработки элемента.
+        """
+        self._ensure_worker()
+        future = self._loop.create_future()
+        self._queue.put_nowait((item, future))
+        return await future
+
+    async def submit_many(self, items: Sequence[Any]) -> List[Any]:
+        """
+        Добавление нескольких элементов (они могут попасть в разные batch-и).
+        Returns: Результаты обработки элементов в том же порядке.
+        """
+        return list(await asyncio.gather(*(self.submit(item) for item in items)))
+
+    async def _collect_batch(self) -> List[Tuple[Any, asyncio.Future]]:
+        """
+        Ожидание первого элемента и добор batch-а до max_batch_size элементов в течение max_wait_ms.
+        """
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        """
+        Фоновая задача: сбор batch-ей, их обработка в отдельном потоке и возвращение результатов.
+        """
+        while True:
+            batch = [(item, future) for item, future in await self._collect_batch() if not future.cancelled()]
+            if not batch:
+                continue
+            try:
+                results = await self._loop.run_in_executor(self._executor, self.process_batch,
+                                                           [item for item, _ in batch])
+            except Exception as error:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+
+            self.num_batches += 1
+            self.num_items += len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def close(self):
+        """
+        Остановка фоновой задачи и потока обработки.
+        """
+        if self._worker is not None and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,166 @@
+"""
+Модуль содержит дисковый кэш результатов распознавания и правки текста. Ключ записи - хэш содержимого
+(PCM сэмплов чанка или исходного текста) и идентификатора модели, поэтому повторная обработка того же аудио
+или аудио с совпадающими фрагментами не требует повторного инференса.
+Общая часть дисковых кэшей (атомарная запись, учет размера и LRU вытеснение) вынесена в DiskCache.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import IO, Any, Callable, Iterator, Optional, Tuple, Union
+
+
+class DiskCache:
+    """
+    Базовый дисковый кэш: каждая запись хранится в отдельном файле с расширением suffix (в cache_dir
+    или в ее поддиректориях), запись выполняется атомарно (через временный файл и os.replace), поэтому кэш
+    можно одновременно использовать из нескольких процессов. Суммарный размер записей учитывается при записи,
+    а при превышении max_size_bytes удаляются записи, к которым дольше всего не обращались (LRU по mtime).
+    """
+    suffix = ""
+
+    def __init__(self, cache_dir: str, max_size_bytes: int):
+        """
+        Args:
+            cache_dir (str): Директория кэша (создается, если ее нет).
+            max_size_bytes (int): Максимальный суммарный размер записей в байтах.
+        """
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._size = sum(size for _, _, size in self._iter_entries())
+
+    def _get_path(self, key: str) -> str:
+        raise NotImplementedError
+
+    def _iter_entries(self) -> Iterator[Tuple[str, float, int]]:
+        """
+        Все записи кэша: тройки (путь, mtime, размер).
+        """
+        directories = [self.cache_dir]
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_dir():
+                directories.append(entry.path)
+        for directory in directories:
+            for file in os.scandir(directory):
+                if file.name.endswith(self.suffix) and file.is_file():
+                    try:
+                        stat = file.stat()
+                    except FileNotFoundError:
+                        continue
+                    yield file.path, stat.st_mtime, stat.st_size
+
+    @staticmethod
+    def _touch(path: str):
+        """
+        Обновление времени последнего обращения к записи (для LRU).
+        """
+        os.utime(path)
+
+    def _write(self, path: str, write: Callable[[IO[bytes]], None]):
+        """
+        Атомарная запись файла записи (повторная запись того же ключа безопасна) с учетом размера кэша.
+        Args:
+            path (str): Путь до записи.
+            write: Функция, записывающая содержимое в открытый на запись (бинарный) файл.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            old_size = os.path.getsize(path)
+        except FileNotFoundError:
+            old_size = 0
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                write(file)
+                size = file.tell()
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            self._size += size - old_size
+            if self._size > self.max_size_bytes:
+                self._evict()
+
+    def _evict(self):
+        """
+        Удаление самых старых записей, пока размер кэша не станет меньше 90% от max_size_bytes.
+        Размер пересчитывается по диску, так как в кэш могут писать другие процессы.
+        """
+        entries = sorted(self._iter_entries(), key=lambda entry: entry[1])
+        self._size = sum(size for _, _, size in entries)
+
+        target_size = 0.9 * self.max_size_bytes
+        for path, _, size in entries:
+            if self._size <= target_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._size -= size
+
+
+class TranscriptionCache(DiskCache):
+    """
+    Дисковый кэш значений (строк или JSON-сериализуемых объектов) в JSON файлах (см. DiskCache).
+    """
+    suffix = ".json"
+
+    def __init__(self, cache_dir: str, max_size_bytes: int = 1 << 30):
+        """
+        Инициализация кэша.
+        Args:
+            cache_dir (str): Директория кэша (создается, если ее нет).
+            max_size_bytes (int): Максимальный суммарный размер записей в байтах.
+        """
+        self.hits = 0
+        self.misses = 0
+        super().__init__(cache_dir, max_size_bytes)
+
+    @staticmethod
+    def make_key(*parts: Union[bytes, str]) -> str:
+        """
+        Ключ записи - sha256 от частей (содержимого и идентификатора модели).
+        """
+        digest = hashlib.sha256()
+        for part in parts:
+            part = part.encode("utf-8") if isinstance(part, str) else part
+            digest.update(len(part).to_bytes(8, "little"))
+            digest.update(part)
+        return digest.hexdigest()
+
+    def _get_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Получение записи.
+        Returns: Значение или None, если записи нет.
+        """
+        path = self._get_path(key)
+        try:
+            with open(path, encoding="utf-8") as file:
+                value = json.load(file)["value"]
+            self._touch(path)
+        except (FileNotFoundError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def put(self, key: str, value: Any):
+        """
+        Добавление записи (атомарно, повторная запись того же ключа безопасна).
+        """
+        data = json.dumps({"value": value}, ensure_ascii=False).encode("utf-8")
+        self._write(self._get_path(key), lambda file: file.write(data))
@@ -0,0 +1,297 @@
+"""
+Модуль содержит консольную утилиту для пакетного перевода аудио в текст.
+Аудио распределяются между несколькими процессами, каждый из которых загружает модели один раз,
+а результаты по мере готовности дописываются в JSONL файл.
+
+Пример запуска:
+    python -m SpeechRecognitionModule path/to/audio_dir "path/to/*.mp3" manifest.jsonl -o results.jsonl --workers 4
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional, Set
+
+from tqdm import tqdm
+
+from .utils import pretty_time_delta
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".flac", ".ogg", ".opus", ".m4a", ".aac", ".wma", ".webm", ".mp4")
+
+_transcriber = None  # Transcriber процесса-исполнителя
+_init_error: Optional[str] = None  # ошибка инициализации Transcriber процесса-исполнителя
+
+
+def _read_manifest(path2manifest: str) -> List[str]:
+    """
+    Чтение манифеста: JSONL (поле audio_filepath, как в Nemo, или path), JSON массив таких записей
+    или текстовый файл с путем на строке. Относительные пути считаются от директории манифеста.
+    """
+    manifest_dir = os.path.dirname(os.path.abspath(path2manifest))
+    with open(path2manifest, encoding="utf-8") as file:
+        content = file.read()
+    if path2manifest.endswith(".json") and content.lstrip().startswith("["):
+        records = enumerate(json.loads(content), start=1)
+    else:
+        records = ((line_number, line.strip()) for line_number, line in enumerate(content.splitlines(), start=1))
+
+    paths = []
+    for line_number, record in records:
+        if not record:
+            continue
+        if path2manifest.endswith((".jsonl", ".json")):
+            if isinstance(record, str):
+                record = json.loads(record)
+            path = record.get("audio_filepath", record.get("path")) if isinstance(record, dict) else None
+            if not isinstance(path, str):
+                raise ValueError(f"{path2manifest}:{line_number}: запись манифеста без поля audio_filepath или path")
+            record = path
+        paths.append(os.path.join(manifest_dir, record))
+    return paths
+
+
+def collect_audio_paths(inputs: Iterable[str]) -> List[str]:
+    """
+    Сбор путей до аудио.
+    Args:
+        inputs: Директории (обходятся рекурсивно), glob-шаблоны, манифесты (.jsonl/.json/.txt) или пути до аудио.
+                Манифест .json может быть как JSONL, так и JSON массивом записей.
+    Returns: Пути до аудио без повторов (в порядке появления).
+    """
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                paths.extend(os.path.join(root, file) for file in sorted(files)
+                             if file.lower().endswith(AUDIO_EXTENSIONS))
+        elif glob.has_magic(item):
+            paths.extend(sorted(glob.glob(item, recursive=True)))
+        elif item.endswith((".jsonl", ".json", ".txt")):
+            paths.extend(_read_manifest(item))
+        else:
+            paths.append(item)
+    return list(dict.fromkeys(os.path.abspath(path) for path in paths))
+
+
+def read_completed(path2output: str) -> Set[str]:
+    """
+    Пути до аудио, которые уже успешно обработаны в предыдущих запусках (для продолжения работы).
+    """
+    completed = set()
+    if not os.path.exists(path2output):
+        return completed
+    with open(path2output, encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # недописанная строка (например, процесс был прерван)
+            if isinstance(record, dict) and "error" not in record and record.get("path") is not None:
+                completed.add(record["path"])
+    return completed
+
+
+def _truncate_partial_line(path2output: str):
+    """
+    Обрезка недописанной последней строки файла результатов (например, процесс был прерван),
+    чтобы новые записи дописывались с начала строки.
+    """
+    if not os.path.exists(path2output):
+        return
+    with open(path2output, "rb+") as file:
+        end = file.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            block_start = max(0, position - 65536)
+            file.seek(block_start)
+            block = file.read(position - block_start)
+            newline = block.rfind(b"\n")
+            if newline != -1:
+                position = block_start + newline + 1
+                break
+            position = block_start
+        if position < end:
+            file.truncate(position)
+
+
+def _init_worker(device: str, num_threads: int, transcriber_kwargs: Dict):
+    """
+    Инициализация процесса-исполнителя: модели загружаются один раз на процесс.
+    Ошибка инициализации не пробрасывается (иначе Pool бесконечно перезапускает процесс), а сохраняется
+    и возвращается как результат для каждого файла.
+    """
+    global _transcriber, _init_error
+    try:
+        import torch
+        from .transcribe import Transcriber
+
+        torch.set_num_threads(num_threads)
+        _transcriber = Transcriber(torch.device(device), verbose=0, num_threads=num_threads, **transcriber_kwargs)
+    except Exception as error:
+        _init_error = f"{type(error).__name__}: {error}"
+
+
+def _transcribe_file(path2audio: str) -> Dict:
+    """
+    Перевод одного аудио в текст в процессе-исполнителе.
+    """
+    if _init_error is not None:
+        return {"path": path2audio, "error": f"Transcriber initialization failed: {_init_error}"}
+    try:
+        result = _transcriber.transcribe(path2audio)
+    except Exception as error:
+        return {"path": path2audio, "error": f"{type(error).__name__}: {error}"}
+    return {"path": path2audio,
+            "text": result.text,
+            "audio_duration": result.audio_duration,
+            "processing_time": result.processing_duration,
+            "stages": result.stages,
+            "counters": result.counters,
+            **({"timestamps": result.timestamps.to_dict()} if result.timestamps is not None else {})}
+
+
+def run_batch(paths2audio: List[str],
+              path2output: str,
+              workers: int = 1,
+              device: str = "cpu",
+              num_threads: Optional[int] = None,
+              **transcriber_kwargs) -> Dict:
+    """
+    Пакетный перевод аудио в текст с записью результатов в JSONL файл.
+    Уже обработанные (присутствующие в path2output) аудио пропускаются.
+    Args:
+        paths2audio (List[str]): Пути до аудио.
+        path2output (str): Путь до JSONL файла с результатами (дописывается).
+        workers (int): Число процессов-исполнителей.
+        device (str): Устройство для моделей ("cpu", "cuda", ...).
+        num_threads (int): Число потоков torch в каждом процессе (по умолчанию - ядра поровну между процессами).
+        **transcriber_kwargs: Параметры Transcriber.
+    Returns: Статистика обработки.
+    """
+    completed = read_completed(path2output)
+    _truncate_partial_line(path2output)
+    pending = [path for path in paths2audio if path not in completed]
+    if num_threads is None:
+        num_threads = max(1, (os.cpu_count() or 1) // workers)
+
+    stats = {"files": len(pending), "skipped": len(paths2audio) - len(pending), "failed": 0,
+             "audio_duration": 0.0, "wall_time": 0.0}
+    if not pending:
+        stats["throughput"] = 0.0
+        return stats
+
+    start_time = time.time()
+    workers = min(workers, len(pending))
+    # ProcessPoolExecutor (в отличие от multiprocessing.Pool) не перезапускает упавшие процессы,
+    # а завершает ожидание результатов ошибкой BrokenProcessPool
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                             initargs=(device, num_threads, transcriber_kwargs)) as executor, \
+            open(path2output, "a", encoding="utf-8") as output_file:
+        futures = [executor.submit(_transcribe_file, path2audio) for path2audio in pending]
+        for future in tqdm(as_completed(futures), total=len(futures)):
+            record = future.result()
+            output_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output_file.flush()
+            if "error" in record:
+                stats["failed"] += 1
+            else:
+                stats["audio_duration"] += record["audio_duration"]
+
+    stats["wall_time"] = time.time() - start_time
+    stats["throughput"] = stats["audio_duration"] / stats["wall_time"] if stats["wall_time"] > 0 else 0.0
+    return stats
+
+
+def main(argv: Optional[List[str]] = None):
+    from .backends import ASR_BACKENDS, SPELLING_BACKENDS
+    from .vad import SpeechFilter
+
+    parser = argparse.ArgumentParser(description="Пакетный перевод аудио в текст.")
+    parser.add_argument("inputs", nargs="+",
+                        help="Директории, glob-шаблоны, манифесты (.jsonl, .json - JSONL или JSON массив записей "
+                             "с полем audio_filepath или path, .txt - путь на строке) или пути до аудио.")
+    parser.add_argument("-o", "--output", required=True, help="JSONL файл с результатами (дописывается).")
+    parser.add_argument("--workers", type=int, default=1, help="Число процессов-исполнителей.")
+    parser.add_argument("--device", default="cpu", help="Устройство для моделей.")
+    parser.add_argument("--num-threads", type=int, default=None, help="Число потоков torch в каждом процессе.")
+    parser.add_argument("--batch-size", type=int, default=16, help="Размер batch-а для Nemo.")
+    parser.add_argument("--max-seq-len", type=int, default=256, help="Максимальная длина входа T5.")
+    parser.add_argument("--max-chunk-duration", type=int, default=150, help="Максимальная длительность чанка (s).")
+    parser.add_argument("--streaming", action="store_true", help="Потоковое декодирование и разбиение аудио.")
+    parser.add_argument("--pipelined", action="store_true", help="Одновременное выполнение этапов.")
+    parser.add_argument("--chunks-queue-size", type=int, default=None,
+                        help="Размер очереди чанков между разбиением и распознаванием (для --pipelined).")
+    parser.add_argument("--transcripts-queue-size", type=int, default=None,
+                        help="Размер очереди транскрипций между распознаванием и правкой (для --pipelined).")
+    parser.add_argument("--asr-batch-size", type=int, default=None,
+                        help="Максимальный размер mini-batch-а Nemo в конвейере (для --pipelined).")
+    parser.add_argument("--spelling-batch-size", type=int, default=None,
+                        help="Максимальный размер mini-batch-а T5 в конвейере (для --pipelined).")
+    parser.add_argument("--spelling-workers", type=int, default=None,
+                        help="Число потоков правки текста в конвейере (для --pipelined).")
+    parser.add_argument("--cache-dir", default=None, help="Директория кэша транскрипций.")
+    parser.add_argument("--decoded-cache-dir", default=None,
+                        help="Директория кэша декодированных аудио (для повторных запусков на тех же файлах).")
+    parser.add_argument("--timestamps", action="store_true", help="Временные метки сегментов и слов в результатах.")
+    parser.add_argument("--speech-filter", action="store_true",
+                        help="Не распознавать чанки без речи и обрезать тишину по краям чанков.")
+    parser.add_argument("--correction-gate", action="store_true",
+                        help="Правка T5 только для длинных предложений (или со словами не из --correction-lexicon).")
+    parser.add_argument("--correction-lexicon", default=None,
+                        help="Словарь (слово в начале строки) для отбора предложений, которым нужна правка T5.")
+    parser.add_argument("--spelling-num-beams", type=int, default=1, help="Число лучей beam search для T5.")
+    parser.add_argument("--spelling-max-new-tokens-ratio", type=float, default=None,
+                        help="Ограничение длины генерации T5 относительно длины входа.")
+    parser.add_argument("--asr-backend", default="eager", choices=ASR_BACKENDS, help="Бэкенд инференса Nemo.")
+    parser.add_argument("--spelling-backend", default="eager", choices=SPELLING_BACKENDS, help="Бэкенд инференса T5.")
+    parser.add_argument("--backend-artifacts-dir", default=None, help="Директория экспортированных моделей.")
+    args = parser.parse_args(argv)
+
+    correction_gate = None
+    if args.correction_gate or args.correction_lexicon is not None:
+        from .spelling_correction import CorrectionGate
+        correction_gate = (CorrectionGate.from_file(args.correction_lexicon) if args.correction_lexicon is not None
+                           else CorrectionGate())
+
+    pipeline_options = {name: getattr(args, name) for name in ("chunks_queue_size", "transcripts_queue_size",
+                                                               "asr_batch_size", "spelling_batch_size",
+                                                               "spelling_workers")
+                        if getattr(args, name) is not None}
+
+    paths2audio = collect_audio_paths(args.inputs)
+    stats = run_batch(paths2audio,
+                      args.output,
+                      workers=args.workers,
+                      device=args.device,
+                      num_threads=args.num_threads,
+                      batch_size=args.batch_size,
+                      max_seq_len=args.max_seq_len,
+                      max_chunk_duration=args.max_chunk_duration,
+                      streaming=args.streaming,
+                      pipelined=args.pipelined,
+                      pipeline_options=pipeline_options,
+                      cache_dir=args.cache_dir,
+                      decoded_audio_cache_dir=args.decoded_cache_dir,
+                      timestamps=args.timestamps,
+                      speech_filter=SpeechFilter() if args.speech_filter else None,
+                      correction_gate=correction_gate,
+                      spelling_num_beams=args.spelling_num_beams,
+                      spelling_max_new_tokens_ratio=args.spelling_max_new_tokens_ratio,
+                      asr_backend=args.asr_backend,
+                      spelling_backend=args.spelling_backend,
+                      backend_artifacts_dir=args.backend_artifacts_dir)
+
+    print(f"""---------------\nBatch stats:
+    \tProcessed files = {stats['files']} (skipped as already done = {stats['skipped']}, failed = {stats['failed']})
+    \tDuration of audio = {pretty_time_delta(stats['audio_duration'])}
+    \tWall time = {pretty_time_delta(stats['wall_time'])}
+    \tThroughput = {round(stats['throughput'], 2)} audio-seconds per wall-second
+    """)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,3 +4,11 @@ class NoSilenceFoundError(Exception):
     def __init__(self):
         msg = "Cannot split on silence."
         super().__init__(msg)
+
+
+class BackendParityError(Exception):
+    """Исключение выбрасывается, если результаты бэкенда инференса слишком отличаются от eager PyTorch."""
+
+    def __init__(self, wer: float, max_wer: float):
+        msg = f"Backend results differ from eager ones: WER = {wer:.4f} > {max_wer:.4f}."
+        super().__init__(msg)
@@ -0,0 +1,327 @@
+"""
+Модуль содержит быстрое чтение аудио в 16K mono float32 без pydub: WAV файлы (PCM 16 bit и float 32 bit) читаются
+через memory map (16K mono float32 WAV - без копирования, 16 bit PCM - с одним преобразованием во float32),
+WAV с другой частотой дискретизации передискретизируются векторизованным полифазным фильтром, остальные форматы
+декодируются ffmpeg сразу в 16K mono.
+Декодированные аудио можно хранить в дисковом кэше (.npy), чтобы повторные запуски на тех же файлах
+не декодировали их заново.
+"""
+import hashlib
+import math
+import os
+import struct
+import subprocess
+import wave
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+from pydub import AudioSegment
+
+from .cache import DiskCache
+
+WAV_FORMAT_PCM = 1
+WAV_FORMAT_IEEE_FLOAT = 3
+WAV_FORMAT_EXTENSIBLE = 0xFFFE
+WAV_DTYPES = {(WAV_FORMAT_PCM, 16): np.dtype("<i2"), (WAV_FORMAT_IEEE_FLOAT, 32): np.dtype("<f4")}
+
+
+@dataclass
+class WavInfo:
+    """
+    Параметры данных WAV файла.
+    Attributes:
+        offset (int): Смещение PCM данных от начала файла в байтах.
+        num_frames (int): Число кадров (сэмплов каждого канала).
+        channels (int): Число каналов.
+        frame_rate (int): Частота дискретизации.
+        dtype (np.dtype): Тип сэмплов.
+    """
+    offset: int
+    num_frames: int
+    channels: int
+    frame_rate: int
+    dtype: np.dtype
+
+
+def read_wav_info(path2audio: str) -> Optional[WavInfo]:
+    """
+    Разбор заголовка RIFF/WAVE.
+    Returns: Параметры данных или None, если файл не WAV или формат сэмплов не поддерживается
+             (такие файлы декодируются ffmpeg).
+    """
+    with open(path2audio, "rb") as file:
+        header = file.read(12)
+        if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            return None
+        wav_format = None
+        while True:
+            chunk_header = file.read(8)
+            if len(chunk_header) < 8:
+                return None
+            chunk_id, chunk_size = chunk_header[:4], struct.unpack("<I", chunk_header[4:])[0]
+            if chunk_id == b"fmt ":
+                fmt_data = file.read(chunk_size)
+                if len(fmt_data) < 16:
+                    return None
+                audio_format, channels, frame_rate, _, _, bits = struct.unpack("<HHIIHH", fmt_data[:16])
+                if audio_format == WAV_FORMAT_EXTENSIBLE and len(fmt_data) >= 26:
+                    audio_format = struct.unpack("<H", fmt_data[24:26])[0]
+                wav_format = (audio_format, bits, channels, frame_rate)
+                file.seek(chunk_size % 2, os.SEEK_CUR)
+            elif chunk_id == b"data":
+                if wav_format is None or wav_format[:2] not in WAV_DTYPES or wav_format[2] == 0:
+                    return None
+                audio_format, bits, channels, frame_rate = wav_format
+                offset = file.tell()
+                # Размер data может быть не заполнен (например, при записи потоком), поэтому он ограничивается файлом
+                data_size = min(chunk_size, os.path.getsize(path2audio) - offset)
+                dtype = WAV_DTYPES[(audio_format, bits)]
+                return WavInfo(offset=offset,
+                               num_frames=data_size // (dtype.itemsize * channels),
+                               channels=channels,
+                               frame_rate=frame_rate,
+                               dtype=dtype)
+            else:
+                file.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+
+
+def _to_mono_float32(frames: np.ndarray) -> np.ndarray:
+    """
+    Приведение кадров WAV (массив (N, channels) int16 или float32) к mono float32 в диапазоне [-1, 1].
+    Mono float32 возвращается без копирования, остальные форматы (в том числе int16) - копией float32.
+    """
+    if frames.shape[1] == 1 and frames.dtype == np.float32:
+        return frames[:, 0]
+    samples = frames.mean(axis=1, dtype=np.float32) if frames.shape[1] > 1 else frames[:, 0].astype(np.float32)
+    if frames.dtype == np.int16:
+        samples /= 32768
+    return samples
+
+
+def _map_wav(path2audio: str, wav_info: WavInfo) -> np.ndarray:
+    """
+    Memory map данных WAV файла в виде массива (N, channels).
+    """
+    if wav_info.num_frames == 0:
+        return np.zeros((0, wav_info.channels), dtype=wav_info.dtype)
+    return np.memmap(path2audio, dtype=wav_info.dtype, mode="r", offset=wav_info.offset,
+                     shape=(wav_info.num_frames, wav_info.channels))
+
+
+def resample_poly(samples: np.ndarray, up: int, down: int, half_len_factor: int = 10, beta: float = 5.0) -> np.ndarray:
+    """
+    Передискретизация в up / down раз полифазным FIR фильтром (windowed sinc с окном Кайзера, как
+    scipy.signal.resample_poly). Для каждой из up фаз фильтра выходные сэмплы считаются по срезам входа с шагом down,
+    поэтому число операций пропорционально длине выхода, умноженной на длину фазы фильтра.
+    Args:
+        samples (np.ndarray): Сигнал (mono, float32).
+        up (int): Коэффициент повышения частоты (например, целевая частота).
+        down (int): Коэффициент понижения частоты (например, исходная частота).
+        half_len_factor (int): Половина длины фильтра в периодах max(up, down).
+        beta (float): Параметр окна Кайзера.
+    Returns: Передискретизированный сигнал float32.
+    """
+    divisor = math.gcd(up, down)
+    up, down = up // divisor, down // divisor
+    if up == down:
+        return samples
+    max_rate = max(up, down)
+    half_len = half_len_factor * max_rate
+    taps = np.sinc(np.arange(-half_len, half_len + 1) / max_rate) * np.kaiser(2 * half_len + 1, beta)
+    taps *= up / taps.sum()
+    taps = taps.astype(np.float32)
+
+    num_output = -(-len(samples) * up // down)
+    phase_len = -(-len(taps) // up)
+    padded = np.concatenate((np.zeros(phase_len, dtype=np.float32), samples.astype(np.float32, copy=False),
+                             np.zeros(phase_len + 2, dtype=np.float32)))
+    output = np.zeros(num_output, dtype=np.float32)
+    down_inverse = pow(down, -1, up) if up > 1 else 0
+    for phase in range(up):
+        # Выходные сэмплы n, для которых (n * down + half_len) % up == phase: n = first + up * i
+        first = ((phase - half_len) * down_inverse) % up
+        if first >= num_output:
+            continue
+        count = (num_output - first + up - 1) // up
+        base = (first * down + half_len) // up + phase_len
+        accumulator = np.zeros(count, dtype=np.float32)
+        for j, tap in enumerate(taps[phase::up]):
+            accumulator += tap * padded[base - j: base - j + down * (count - 1) + 1: down]
+        output[first::up] = accumulator
+    return output
+
+
+def iter_ffmpeg_blocks(path2audio: str, frame_rate: int = 16000, block_duration: float = 30.0) -> Iterator[np.ndarray]:
+    """
+    Потоковое декодирование аудио с помощью ffmpeg (того же, что использует pydub) сразу в mono с частотой frame_rate.
+    Args:
+        path2audio (str): Путь до аудио.
+        frame_rate (int): Частота дискретизации, к которой приводится аудио.
+        block_duration (float): Длительность блока в секундах.
+    Returns:
+        Генератор блоков mono float32 в диапазоне [-1, 1].
+    """
+    command = [AudioSegment.converter, "-nostdin", "-v", "error", "-i", path2audio,
+               "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", str(frame_rate), "-"]
+    block_size = int(block_duration * frame_rate) * 2  # 16 bit
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        while True:
+            data = process.stdout.read(block_size)
+            if not data:
+                break
+            data = data[:len(data) - len(data) % 2]
+            block = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+            block /= 32768
+            yield block
+    finally:
+        process.stdout.close()
+        stderr = process.stderr.read()
+        process.stderr.close()
+        return_code = process.wait()
+    if return_code != 0:
+        raise RuntimeError(f"Decoding failed. ffmpeg returned error code: {return_code}\n\n{stderr.decode()}")
+
+
+class DecodedAudioCache(DiskCache):
+    """
+    Дисковый кэш декодированных аудио (см. DiskCache): 16K mono float32 сигнал хранится в .npy файле
+    и читается через memory map. Ключ записи - хэш содержимого файла и частота дискретизации. Хэш пересчитывается
+    только при изменении размера или mtime файла, в памяти хранятся хэши max_digests последних файлов.
+    """
+    suffix = ".npy"
+
+    def __init__(self, cache_dir: str, max_size_bytes: int = 10 << 30, max_digests: int = 4096):
+        """
+        Args:
+            cache_dir (str): Директория кэша (создается, если ее нет).
+            max_size_bytes (int): Максимальный суммарный размер записей в байтах.
+            max_digests (int): Максимальное число хэшей файлов, запоминаемых в памяти (LRU).
+        """
+        super().__init__(cache_dir, max_size_bytes)
+        self.max_digests = max_digests
+        self._digests: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+
+    def make_key(self, path2audio: str, frame_rate: int) -> str:
+        """
+        Ключ записи для аудио файла.
+        """
+        stat = os.stat(path2audio)
+        file_id = (os.path.realpath(path2audio), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            digest = self._digests.get(file_id)
+            if digest is not None:
+                self._digests.move_to_end(file_id)
+        if digest is None:
+            file_hash = hashlib.sha256()
+            with open(path2audio, "rb") as file:
+                for block in iter(lambda: file.read(1 << 20), b""):
+                    file_hash.update(block)
+            digest = file_hash.hexdigest()
+            with self._lock:
+                self._digests[file_id] = digest
+                self._digests.move_to_end(file_id)
+                while len(self._digests) > self.max_digests:
+                    self._digests.popitem(last=False)
+        return f"{digest}_{frame_rate}"
+
+    def _get_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".npy")
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """
+        Получение декодированного аудио (memory map только для чтения).
+        Returns: Сигнал или None, если записи нет.
+        """
+        path = self._get_path(key)
+        try:
+            samples = np.load(path, mmap_mode="r")
+            self._touch(path)
+        except (FileNotFoundError, ValueError):
+            return None
+        return samples
+
+    def put(self, key: str, samples: np.ndarray):
+        """
+        Сохранение декодированного аудио (атомарно, через временный файл).
+        """
+        self._write(self._get_path(key), lambda file: np.save(file, np.asarray(samples, dtype=np.float32)))
+
+
+def load_pcm(path2audio: str,
+             frame_rate: int = 16000,
+             cache: Optional[DecodedAudioCache] = None) -> Tuple[np.ndarray, str]:
+    """
+    Чтение аудио в mono float32 с частотой frame_rate.
+    Args:
+        path2audio (str): Путь до аудио.
+        frame_rate (int): Частота дискретизации.
+        cache (DecodedAudioCache): Кэш декодированных аудио (для всех файлов, кроме WAV с частотой frame_rate).
+    Returns: Сигнал (может быть memory map только для чтения) и источник: "wav" (memory map WAV файла),
+             "cache", "resample" (WAV с другой частотой) или "ffmpeg".
+    """
+    wav_info = read_wav_info(path2audio)
+    if wav_info is not None and wav_info.frame_rate == frame_rate:
+        return _to_mono_float32(_map_wav(path2audio, wav_info)), "wav"
+
+    key = cache.make_key(path2audio, frame_rate) if cache is not None else None
+    if key is not None:
+        samples = cache.get(key)
+        if samples is not None:
+            return samples, "cache"
+
+    if wav_info is not None:
+        samples = resample_poly(_to_mono_float32(_map_wav(path2audio, wav_info)), frame_rate, wav_info.frame_rate)
+        source = "resample"
+    else:
+        blocks = list(iter_ffmpeg_blocks(path2audio, frame_rate=frame_rate))
+        samples = np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+        source = "ffmpeg"
+    if key is not None:
+        cache.put(key, samples)
+    return samples, source
+
+
+def iter_pcm_blocks(path2audio: str,
+                    frame_rate: int = 16000,
+                    block_duration: float = 30.0,
+                    cache: Optional[DecodedAudioCache] = None) -> Iterator[np.ndarray]:
+    """
+    Потоковое чтение аудио блоками mono float32 с частотой frame_rate. WAV файлы с частотой frame_rate
+    и аудио из кэша читаются блоками из memory map, остальные аудио декодируются ffmpeg.
+    Args:
+        path2audio (str): Путь до аудио.
+        frame_rate (int): Частота дискретизации, к которой приводится аудио.
+        block_duration (float): Длительность блока в секундах.
+        cache (DecodedAudioCache): Кэш декодированных аудио (только чтение).
+    Returns:
+        Генератор блоков mono float32 в диапазоне [-1, 1].
+    """
+    wav_info = read_wav_info(path2audio)
+    cached_samples = None
+    if (wav_info is None or wav_info.frame_rate != frame_rate) and cache is not None:
+        cached_samples = cache.get(cache.make_key(path2audio, frame_rate))
+    if wav_info is not None and wav_info.frame_rate == frame_rate:
+        frames = _map_wav(path2audio, wav_info)
+    elif cached_samples is not None:
+        frames = cached_samples[:, None]
+    else:
+        yield from iter_ffmpeg_blocks(path2audio, frame_rate=frame_rate, block_duration=block_duration)
+        return
+
+    block_size = int(block_duration * frame_rate)
+    for block_start in range(0, len(frames), block_size):
+        yield np.array(_to_mono_float32(frames[block_start: block_start + block_size]), dtype=np.float32)
+
+
+def write_wav(path: str, samples: np.ndarray, frame_rate: int = 16000):
+    """
+    Запись mono float32 сигнала в 16 bit WAV файл.
+    """
+    with wave.open(path, "wb") as file:
+        file.setnchannels(1)
+        file.setsampwidth(2)
+        file.setframerate(frame_rate)
+        file.writeframes(np.clip(np.rint(samples * 32768), -32768, 32767).astype("<i2").tobytes())
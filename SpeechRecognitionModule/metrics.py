@@ -0,0 +1,209 @@
+"""
+Модуль содержит инструментирование этапов перевода аудио в текст: интервалы (spans) с атрибутами для этапов,
+batch-ей и уровней разбиения и счетчики (counters). Результаты передаются в подключаемые приемники (sinks):
+логирование, JSON trace файл и текстовый формат Prometheus.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger("SpeechRecognitionModule")
+
+
+class MetricsSink:
+    """
+    Базовый приемник метрик.
+    """
+
+    def emit_span(self, span: Dict):
+        """
+        Вызывается при завершении каждого интервала.
+        """
+
+    def emit_counter(self, name: str, value: float, labels: Dict[str, str]):
+        """
+        Вызывается при каждом изменении счетчика.
+        """
+
+    def flush(self, instrumentation: "Instrumentation"):
+        """
+        Вызывается по завершении обработки аудио.
+        """
+
+    def close(self):
+        """
+        Освобождение ресурсов приемника (вызывается, когда приемник больше не нужен).
+        """
+
+
+class LoggingSink(MetricsSink):
+    """
+    Приемник, пишущий интервалы и счетчики в logging (логгер "SpeechRecognitionModule").
+    """
+
+    def __init__(self, level: int = logging.DEBUG):
+        self.level = level
+
+    def emit_span(self, span: Dict):
+        logger.log(self.level, "span %s %.3fs %s", span["name"], span["duration"], span["attributes"])
+
+    def emit_counter(self, name: str, value: float, labels: Dict[str, str]):
+        logger.log(self.level, "counter %s += %s %s", name, value, labels)
+
+    def flush(self, instrumentation: "Instrumentation"):
+        logger.log(self.level, "stages %s counters %s", instrumentation.get_stage_durations(), instrumentation.counters)
+
+
+class JsonTraceSink(MetricsSink):
+    """
+    Приемник, дописывающий интервалы и счетчики в JSONL файл (одна запись на строку).
+    Файл открывается один раз (с построчной буферизацией) и закрывается методом close.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8", buffering=1)
+
+    def _write(self, record: Dict):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+
+    def emit_span(self, span: Dict):
+        self._write({"type": "span", **span})
+
+    def emit_counter(self, name: str, value: float, labels: Dict[str, str]):
+        self._write({"type": "counter", "name": name, "value": value, "labels": labels, "time": time.time()})
+
+    def flush(self, instrumentation: "Instrumentation"):
+        with self._lock:
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class PrometheusTextSink(MetricsSink):
+    """
+    Приемник, накапливающий метрики по всем обработанным аудио и записывающий их в текстовом формате Prometheus
+    (например, для node_exporter textfile collector). Файл заменяется атомарно (через временный файл в той же
+    директории и os.replace), поэтому читатель не увидит недописанный файл.
+    """
+
+    def __init__(self, path: str, prefix: str = "speech_recognition"):
+        self.path = path
+        self.prefix = prefix
+        self.counters: Dict[str, Dict[tuple, float]] = {}
+        self.span_sums: Dict[str, float] = {}
+        self.span_counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def emit_span(self, span: Dict):
+        with self._lock:
+            self.span_sums[span["name"]] = self.span_sums.get(span["name"], 0.0) + span["duration"]
+            self.span_counts[span["name"]] = self.span_counts.get(span["name"], 0) + 1
+
+    def emit_counter(self, name: str, value: float, labels: Dict[str, str]):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            metric = self.counters.setdefault(name, {})
+            metric[key] = metric.get(key, 0.0) + value
+
+    def flush(self, instrumentation: "Instrumentation"):
+        lines = [f"# TYPE {self.prefix}_span_seconds summary"]
+        with self._lock:
+            for name in sorted(self.span_sums):
+                lines.append(f'{self.prefix}_span_seconds_sum{{span="{name}"}} {self.span_sums[name]}')
+                lines.append(f'{self.prefix}_span_seconds_count{{span="{name}"}} {self.span_counts[name]}')
+            for name in sorted(self.counters):
+                lines.append(f"# TYPE {self.prefix}_{name}_total counter")
+                for key, value in sorted(self.counters[name].items()):
+                    labels = ",".join(f'{label}="{label_value}"' for label, label_value in key)
+                    lines.append(f"{self.prefix}_{name}_total{{{labels}}} {value}" if labels
+                                 else f"{self.prefix}_{name}_total {value}")
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                file.write("\n".join(lines) + "\n")
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+class Instrumentation:
+    """
+    Сборщик интервалов и счетчиков для обработки одного аудио. Потокобезопасен (используется в PipelinedExecutor).
+    """
+
+    def __init__(self, sinks: Optional[List[MetricsSink]] = None):
+        """
+        Args:
+            sinks (List[MetricsSink]): Приемники метрик. Если None, то метрики только накапливаются в объекте.
+        """
+        self.sinks = sinks if sinks is not None else []
+        self.spans: List[Dict] = []
+        self.counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Dict]:
+        """
+        Интервал выполнения. Атрибуты можно дополнять внутри блока через возвращаемый словарь.
+        Args:
+            name (str): Название интервала (например, "decode", "asr_batch").
+            **attributes: Атрибуты интервала.
+        """
+        start_time = time.time()
+        start_counter = time.perf_counter()
+        try:
+            yield attributes
+        finally:
+            span = {"name": name,
+                    "start": start_time,
+                    "duration": time.perf_counter() - start_counter,
+                    "thread": threading.current_thread().name,
+                    "attributes": attributes}
+            with self._lock:
+                self.spans.append(span)
+            for sink in self.sinks:
+                sink.emit_span(span)
+
+    def counter(self, name: str, value: float = 1, **labels):
+        """
+        Увеличение счетчика. Счетчики с метками накапливаются отдельно для каждого набора меток.
+        Args:
+            name (str): Название счетчика (например, "cache_hits").
+            value (float): Приращение.
+            **labels: Метки (например, stage="asr").
+        """
+        key = name if not labels else name + "{" + ",".join(f"{k}={v}" for k, v in sorted(labels.items())) + "}"
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+        for sink in self.sinks:
+            sink.emit_counter(name, value, {k: str(v) for k, v in labels.items()})
+
+    def get_stage_durations(self) -> Dict[str, float]:
+        """
+        Суммарная продолжительность интервалов по названиям.
+        """
+        durations: Dict[str, float] = {}
+        with self._lock:
+            for span in self.spans:
+                durations[span["name"]] = durations.get(span["name"], 0.0) + span["duration"]
+        return durations
+
+    def flush(self):
+        """
+        Передача итогов обработки аудио в приемники.
+        """
+        for sink in self.sinks:
+            sink.flush(self)
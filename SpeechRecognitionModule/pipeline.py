@@ -0,0 +1,232 @@
+"""
+Модуль содержит конвейерное (pipelined) выполнение этапов перевода аудио в текст: разбиение аудио на чанки,
+первичное распознавание и правка текста выполняются одновременно в отдельных потоках, а чанки передаются между
+этапами через ограниченные очереди. Общее время обработки стремится ко времени самого медленного этапа,
+а не к сумме времен всех этапов.
+Разбиение выполняется одновременно с распознаванием только при потоковом разбиении (Transcriber(streaming=True)):
+обычное разбиение (Audio2Chunks) ищет тишину по всему аудио, поэтому чанки передаются дальше только после
+его завершения, и одновременно выполняются распознавание и правка текста.
+"""
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+
+from .raw_transcription import RawTranscriptionModel
+from .split_audio import Audio2Chunks
+from .streaming import StreamingAudio2Chunks
+from .timestamps import TimestampedTranscript
+from .utils import concatenate_sentences, print_stats
+
+_END = object()  # маркер конца очереди
+
+
+class PipelinedExecutor:
+    """
+    Класс для конвейерного перевода аудио в текст с помощью моделей, загруженных в Transcriber.
+    """
+
+    def __init__(self,
+                 transcriber,
+                 chunks_queue_size: int = 32,
+                 transcripts_queue_size: int = 64,
+                 asr_batch_size: Optional[int] = None,
+                 spelling_batch_size: Optional[int] = None,
+                 spelling_workers: int = 1):
+        """
+        Инициализация конвейера.
+        Args:
+            transcriber (Transcriber): Transcriber с загруженными моделями и параметрами разбиения аудио.
+            chunks_queue_size (int): Максимальное число чанков в очереди между разбиением и распознаванием.
+            transcripts_queue_size (int): Максимальное число транскрипций в очереди между распознаванием и правкой.
+            asr_batch_size (int): Максимальный размер mini-batch-а для Nemo (по умолчанию transcriber.batch_size).
+            spelling_batch_size (int): Максимальный размер mini-batch-а для T5 (по умолчанию
+                                       transcriber.spelling_batch_size).
+            spelling_workers (int): Число потоков, выполняющих правку текста.
+        """
+        self.transcriber = transcriber
+        self.chunks_queue_size = chunks_queue_size
+        self.transcripts_queue_size = transcripts_queue_size
+        self.asr_batch_size = asr_batch_size if asr_batch_size is not None else transcriber.batch_size
+        self.spelling_batch_size = (spelling_batch_size if spelling_batch_size is not None
+                                    else transcriber.spelling_batch_size)
+        self.spelling_workers = spelling_workers
+
+        self.audio_duration = None
+        self.split_audio_duration = None
+        self.transcription_duration = None
+        self.spelling_correction_duration = None
+        self.pipeline_duration = None
+        self.timestamps_transcript: Optional[TimestampedTranscript] = None
+
+    def _put(self, target_queue: queue.Queue, item) -> bool:
+        """
+        Добавление элемента в очередь. Ожидание прерывается, если в одном из потоков возникла ошибка.
+        Returns: True, если элемент добавлен.
+        """
+        while not self._stop_event.is_set():
+            try:
+                target_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get_batch(self, source_queue: queue.Queue, batch_size: int) -> list:
+        """
+        Получение mini-batch-а из очереди: ожидается первый элемент, остальные берутся только если уже готовы.
+        Маркер конца очереди (_END) возвращается последним элементом batch-а.
+        """
+        batch = []
+        while not self._stop_event.is_set():
+            try:
+                batch.append(source_queue.get(timeout=0.1))
+                break
+            except queue.Empty:
+                continue
+        while batch and batch[-1] is not _END and len(batch) < batch_size:
+            try:
+                batch.append(source_queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_stage(self, target, *args):
+        """
+        Обертка над этапом конвейера: при ошибке сохраняет ее и останавливает остальные этапы.
+        """
+        try:
+            target(*args)
+        except BaseException as error:
+            self._errors.append(error)
+            self._stop_event.set()
+
+    def _split_stage(self, path2audio: str):
+        """
+        Этап разбиения аудио на чанки. С StreamingAudio2Chunks чанки передаются в очередь по мере нарезки,
+        с Audio2Chunks - после разбиения всего аудио.
+        """
+        transcriber = self.transcriber
+        if transcriber.streaming:
+            audio_splitter = StreamingAudio2Chunks(path2audio=path2audio,
+                                                   verbose=transcriber.verbose,
+                                                   max_chunk_duration=transcriber.max_chunk_duration,
+                                                   split_levels=transcriber.split_levels,
+                                                   merge_target_duration=transcriber.merge_target_duration,
+                                                   speech_filter=transcriber.speech_filter,
+                                                   audio_cache=transcriber.audio_cache,
+                                                   instrumentation=transcriber.instrumentation)
+            chunks = audio_splitter.iter_chunks()
+        else:
+            audio_splitter = Audio2Chunks(path2audio=path2audio,
+                                          verbose=transcriber.verbose,
+                                          max_chunk_duration=transcriber.max_chunk_duration,
+                                          split_levels=transcriber.split_levels,
+                                          merge_target_duration=transcriber.merge_target_duration,
+                                          speech_filter=transcriber.speech_filter,
+                                          audio_cache=transcriber.audio_cache,
+                                          instrumentation=transcriber.instrumentation)
+            audio_splitter.split_chunks(save_chunks=transcriber.save_chunks)
+            chunks = zip(audio_splitter.chunks, audio_splitter.chunks_arrays)
+
+        self._frame_rate = audio_splitter.frame_rate
+        for idx, (chunk, chunk_array) in enumerate(chunks):
+            if not self._put(self._chunks_queue, (idx, chunk, chunk_array)):
+                return
+        self.audio_duration = audio_splitter.audio_duration
+        self.split_audio_duration = audio_splitter.split_audio_duration
+        self._put(self._chunks_queue, _END)
+
+    def _transcription_stage(self):
+        """
+        Этап первичного распознавания чанков mini-batch-ами по мере их поступления.
+        """
+        self.transcription_duration = 0
+        while not self._stop_event.is_set():
+            batch = self._get_batch(self._chunks_queue, self.asr_batch_size)
+            finished = bool(batch) and batch[-1] is _END
+            items = batch[:-1] if finished else batch
+            if items:
+                nemo_model = RawTranscriptionModel(chunks_arrays=[chunk_array for _, _, chunk_array in items],
+                                                   model=self.transcriber.asr_model,
+                                                   cache=self.transcriber.cache,
+                                                   instrumentation=self.transcriber.instrumentation,
+                                                   return_timestamps=self.transcriber.timestamps)
+                nemo_model.raw_transcription(batch_size=self.asr_batch_size)
+                self.transcription_duration += nemo_model.transcription_duration
+                for (idx, (start, end), _), transcribed_text, words_timestamps in zip(
+                        items, nemo_model.chunks_transcriptions, nemo_model.chunks_words_timestamps):
+                    if len(transcribed_text) == 0:
+                        continue
+                    self._chunks_alignment[idx] = ((start / self._frame_rate, end / self._frame_rate),
+                                                   transcribed_text, words_timestamps)
+                    if not self._put(self._transcripts_queue, (idx, transcribed_text)):
+                        return
+            if finished:
+                for _ in range(self.spelling_workers):
+                    self._put(self._transcripts_queue, _END)
+                return
+
+    def _spelling_stage(self, results: Dict[int, str]):
+        """
+        Этап правки текста готовых транскрипций mini-batch-ами.
+        """
+        while not self._stop_event.is_set():
+            batch = self._get_batch(self._transcripts_queue, self.spelling_batch_size)
+            finished = bool(batch) and batch[-1] is _END
+            items = batch[:-1] if finished else batch
+            if items:
+                speller = self.transcriber.make_speller([text for _, text in items],
+                                                        instrumentation=self.transcriber.instrumentation,
+                                                        batch_size=self.spelling_batch_size)
+                corrected_sentences = speller.correct_spelling()
+                with self._lock:
+                    self.spelling_correction_duration += speller.spelling_correction_duration
+                    for (idx, _), corrected_sentence in zip(items, corrected_sentences):
+                        results[idx] = corrected_sentence
+            if finished:
+                return
+
+    def run(self, path2audio: str) -> str:
+        """
+        Функция переводит аудио в текст, выполняя этапы одновременно.
+        Args:
+            path2audio (str): Путь до аудио.
+
+        Returns:
+            Текст извлеченный из аудио.
+        """
+        pipeline_start_time = time.time()
+        self._chunks_queue = queue.Queue(maxsize=self.chunks_queue_size)
+        self._transcripts_queue = queue.Queue(maxsize=self.transcripts_queue_size)
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._errors: List[BaseException] = []
+        self.spelling_correction_duration = 0
+        self._chunks_alignment = {}
+
+        results: Dict[int, str] = {}
+        # Имена потоков попадают в интервалы инструментирования
+        threads = [threading.Thread(target=self._run_stage, args=(self._split_stage, path2audio), name="split"),
+                   threading.Thread(target=self._run_stage, args=(self._transcription_stage,), name="asr")]
+        threads += [threading.Thread(target=self._run_stage, args=(self._spelling_stage, results), name=f"spelling-{i}")
+                    for i in range(self.spelling_workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if self._errors:
+            raise self._errors[0]
+
+        output = concatenate_sentences([results[idx] for idx in sorted(results)])
+        if self.transcriber.timestamps:
+            self.timestamps_transcript = TimestampedTranscript.from_chunks(
+                [self._chunks_alignment[idx] for idx in sorted(results)], [results[idx] for idx in sorted(results)])
+        self.pipeline_duration = time.time() - pipeline_start_time
+
+        if self.transcriber.verbose >= 1: print_stats(audio_duration=self.audio_duration,
+                                                      time_for_splitting_audio=self.split_audio_duration,
+                                                      time_for_transcribing=self.transcription_duration,
+                                                      time_for_spelling_correction=self.spelling_correction_duration,
+                                                      overall_time=self.pipeline_duration)
+        return output
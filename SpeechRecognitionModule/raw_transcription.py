@@ -1,11 +1,21 @@
 """
 Модуль содержит в себе класс, для работы с этапом распознавания аудио в чанках.
 """
+import os
 import time
-from typing import List
+from typing import List, Optional, Tuple
 
 import nemo.collections.asr as nemo_asr
-from tqdm import tqdm
+import numpy as np
+import torch
+
+from .backends import get_backend
+from .cache import TranscriptionCache
+from .metrics import Instrumentation
+
+ASR_MODEL_NAME = "nvidia/stt_ru_conformer_transducer_large"
+ENCODER_FRAME_DURATION = 0.04  # 10 мс шаг признаков x 4 subsampling в conformer
+WORD_START_MARKER = "▁"  # SentencePiece
 
 
 class RawTranscriptionModel:
@@ -13,42 +23,227 @@ class RawTranscriptionModel:
     Класс для первичного распознавания речи.
     """
 
-    def __init__(self, paths2chunks: List[str]):
+    def __init__(self,
+                 paths2chunks: Optional[List[str]] = None,
+                 model: Optional[nemo_asr.models.EncDecRNNTBPEModel] = None,
+                 chunks_arrays: Optional[List[np.ndarray]] = None,
+                 cache: Optional[TranscriptionCache] = None,
+                 instrumentation: Optional[Instrumentation] = None,
+                 return_timestamps: bool = False):
         """
         Инициализация модели Nemo, для распознавания речи.
+        Чанки передаются либо путями до файлов (paths2chunks), либо массивами в памяти (chunks_arrays).
         Args:
             paths2chunks (List[str]): Список путей до чанков к распознаваемому аудио (аудио и его чанки
                                                                                     должны быть 16K mono wav!).
+            model (EncDecRNNTBPEModel): Уже загруженная модель Nemo. Если None, то модель загружается заново.
+            chunks_arrays (List[np.ndarray]): Список чанков в виде массивов float32 (16K mono) в диапазоне [-1, 1].
+            cache (TranscriptionCache): Кэш транскрипций. Если задан, то распознаются только чанки, которых нет в кэше.
+            instrumentation (Instrumentation): Сборщик метрик (интервал на каждый batch, попадания в кэш).
+            return_timestamps (bool): True, если нужны времена слов из выравнивания RNNT
+                                      (в self.chunks_words_timestamps).
         """
-        self.model = nemo_asr.models.EncDecRNNTBPEModel.from_pretrained("nvidia/stt_ru_conformer_transducer_large")
+        self.model = model if model is not None else self.load_model()
         self.paths2chunks = paths2chunks
-        self.num_chunks = len(paths2chunks)
+        self.chunks_arrays = chunks_arrays
+        self.num_chunks = len(chunks_arrays) if chunks_arrays is not None else len(paths2chunks)
+        self.cache = cache
+        self.instrumentation = instrumentation if instrumentation is not None else Instrumentation()
+        self.return_timestamps = return_timestamps
+        self.frame_duration = self._get_frame_duration()
         self.raw_transcriptions: List[str] = []
+        self.chunks_transcriptions: List[str] = []
+        self.chunks_words_timestamps: List[Optional[np.ndarray]] = []
         self.transcription_duration = None
 
-    def _transcribe_chunk(self, idx: int, batch_size: int = 16) -> None:
+    @staticmethod
+    def load_model(device: Optional[torch.device] = None) -> nemo_asr.models.EncDecRNNTBPEModel:
+        """
+        Загрузка модели Nemo для распознавания речи.
+        Args:
+            device (torch.device): GPU или CPU. Если None, то модель остается на устройстве по умолчанию.
+        Returns: Модель Nemo в режиме eval.
+        """
+        model = nemo_asr.models.EncDecRNNTBPEModel.from_pretrained(ASR_MODEL_NAME)
+        if device is not None:
+            model = model.to(device)
+        return model.eval()
+
+    def _get_frame_duration(self) -> float:
+        """
+        Длительность кадра энкодера в секундах (шаг, с которым RNNT выдает токены).
+        """
+        try:
+            config = self.model.cfg
+            return config.preprocessor.window_stride * config.encoder.subsampling_factor
+        except (AttributeError, KeyError, TypeError):
+            return ENCODER_FRAME_DURATION
+
+    def _get_words_timestamps(self, hypothesis) -> Optional[np.ndarray]:
+        """
+        Времена слов по выравниванию RNNT: номерам кадров энкодера, на которых были выданы токены.
+        Слово начинается с токена с маркером начала слова SentencePiece.
+        Args:
+            hypothesis (Hypothesis): Гипотеза декодера Nemo (text, y_sequence, timestep).
+        Returns: Массив (число слов, 2) [start, end] в секундах от начала чанка или None,
+                 если выравнивание недоступно.
+        """
+        timestep = getattr(hypothesis, "timestep", None)
+        if isinstance(timestep, dict):
+            timestep = timestep.get("timestep")
+        if timestep is None or len(timestep) == 0:
+            return None
+        timestep = np.asarray(timestep.cpu() if isinstance(timestep, torch.Tensor) else timestep, dtype=np.float64)
+        tokens = self.model.tokenizer.ids_to_tokens([int(token_id) for token_id in hypothesis.y_sequence])
+        if len(tokens) != len(timestep):
+            return None
+
+        words_bounds = []
+        for idx, token in enumerate(tokens):
+            if token.startswith(WORD_START_MARKER) or not words_bounds:
+                words_bounds.append([idx, idx])
+            else:
+                words_bounds[-1][1] = idx
+        if len(words_bounds) != len(hypothesis.text.split()):
+            return None
+        words_bounds = np.asarray(words_bounds)
+        return np.stack((timestep[words_bounds[:, 0]], timestep[words_bounds[:, 1]] + 1), axis=1) * self.frame_duration
+
+    def _decode_hypotheses(self, hypotheses) -> Tuple[List[str], List[Optional[np.ndarray]]]:
+        """
+        Тексты гипотез и времена их слов.
+        """
+        if len(hypotheses) != 0 and isinstance(hypotheses[0], str):  # модель не возвращает гипотезы
+            return list(hypotheses), [None] * len(hypotheses)
+        return ([hypothesis.text for hypothesis in hypotheses],
+                [self._get_words_timestamps(hypothesis) for hypothesis in hypotheses])
+
+    def _get_length_sorted_order(self, indices: List[int]) -> List[int]:
         """
-        Транскрибация отдельного чанка.
+        Порядок чанков по возрастанию их длины. Все чанки - 16K mono wav, поэтому размер файла
+        пропорционален длительности.
         Args:
-            idx: Индекс чанка.
+            indices: Индексы чанков, которые нужно упорядочить.
+        Returns: Индексы чанков, отсортированные по длине.
+        """
+        if self.chunks_arrays is not None:
+            return sorted(indices, key=lambda idx: len(self.chunks_arrays[idx]))
+        return sorted(indices, key=lambda idx: os.path.getsize(self.paths2chunks[idx]))
+
+    def _get_cache_key(self, idx: int) -> str:
+        """
+        Ключ кэша для чанка: хэш его PCM сэмплов (или содержимого файла) и идентификатора модели (с бэкендом).
+        """
+        if self.chunks_arrays is not None:
+            content = np.ascontiguousarray(self.chunks_arrays[idx], dtype=np.float32).tobytes()
+        else:
+            with open(self.paths2chunks[idx], "rb") as file:
+                content = file.read()
+        backend = get_backend(self.model)
+        model_id = ASR_MODEL_NAME if backend == "eager" else f"{ASR_MODEL_NAME}:{backend}"
+        if self.return_timestamps:
+            return TranscriptionCache.make_key(model_id, "timestamps", content)
+        return TranscriptionCache.make_key(model_id, content)
+
+    def _transcribe_arrays(self, order: List[int], batch_size: int) -> Tuple[List[str], List[Optional[np.ndarray]]]:
+        """
+        Транскрибация чанков, находящихся в памяти, без записи на диск.
+        Args:
+            order: Индексы чанков, отсортированные по длине.
             batch_size: Размер batch-а.
+        Returns: Транскрипции чанков и времена их слов (если return_timestamps) в порядке order.
         """
-        transcribed_text = self.model.transcribe([self.paths2chunks[idx]], batch_size=batch_size)[0][0]
-        if len(transcribed_text) != 0:
-            self.raw_transcriptions.append(transcribed_text)
+        parameter = next(self.model.parameters(), None)
+        # У квантованной или экспортированной модели (только CPU) может не остаться обычных параметров
+        device = parameter.device if parameter is not None else torch.device("cpu")
+        featurizer = self.model.preprocessor.featurizer
+        dither_value, pad_to_value = featurizer.dither, featurizer.pad_to
+        # Так же, как и в EncDecRNNTModel.transcribe
+        featurizer.dither = 0.0
+        featurizer.pad_to = 0
+
+        sorted_transcriptions = []
+        sorted_words_timestamps = []
+        try:
+            with torch.no_grad():
+                for batch_start in range(0, len(order), batch_size):
+                    batch_chunks = [self.chunks_arrays[idx] for idx in order[batch_start: batch_start + batch_size]]
+                    lengths = torch.tensor([len(chunk) for chunk in batch_chunks], dtype=torch.long)
+                    signal = torch.zeros(len(batch_chunks), int(lengths.max()), dtype=torch.float32)
+                    for row, chunk in enumerate(batch_chunks):
+                        signal.numpy()[row, :len(chunk)] = chunk  # чанк может быть memory map только для чтения
+
+                    with self.instrumentation.span("asr_batch",
+                                                   batch_size=len(batch_chunks),
+                                                   frames=int(lengths.sum()),
+                                                   padding_ratio=1 - float(lengths.sum()) / signal.numel()):
+                        encoded, encoded_len = self.model.forward(input_signal=signal.to(device),
+                                                                  input_signal_length=lengths.to(device))
+                        if self.return_timestamps:
+                            hypotheses, _ = self.model.decoding.rnnt_decoder_predictions_tensor(
+                                encoder_output=encoded, encoded_lengths=encoded_len, return_hypotheses=True)
+                            best_hyp, words_timestamps = self._decode_hypotheses(hypotheses)
+                        else:
+                            best_hyp, _ = self.model.decoding.rnnt_decoder_predictions_tensor(
+                                encoder_output=encoded, encoded_lengths=encoded_len)
+                            words_timestamps = [None] * len(best_hyp)
+                    sorted_transcriptions.extend(best_hyp)
+                    sorted_words_timestamps.extend(words_timestamps)
+        finally:
+            featurizer.dither = dither_value
+            featurizer.pad_to = pad_to_value
+
+        return sorted_transcriptions, sorted_words_timestamps
 
     def raw_transcription(self, batch_size: int = 16) -> None:
         """
         Транскрибация всех чанков. Результат транскрибации находится в self.raw_transcriptions
+        (в self.chunks_transcriptions - транскрипции всех чанков, включая пустые).
+        Чанки сортируются по длине, поэтому каждый batch состоит из чанков близкой длины (минимум padding-а).
+        Результаты возвращаются в исходный порядок чанков. Чанки, транскрипции которых есть в кэше, не распознаются.
         Args:
             batch_size: Размер batch-а.
         """
         transcribing_start_time = time.time()
-        for i in tqdm(range(self.num_chunks)):
-            self._transcribe_chunk(i, batch_size=batch_size)
-        self.transcription_duration = time.time() - transcribing_start_time
-
+        self.chunks_transcriptions = [None] * self.num_chunks
+        self.chunks_words_timestamps = [None] * self.num_chunks
 
+        cache_keys = None
+        if self.cache is not None:
+            cache_keys = [self._get_cache_key(idx) for idx in range(self.num_chunks)]
+            for idx, value in enumerate(self.cache.get(key) for key in cache_keys):
+                if value is not None and self.return_timestamps:
+                    self.chunks_transcriptions[idx] = value["text"]
+                    self.chunks_words_timestamps[idx] = (np.asarray(value["words"]).reshape(-1, 2)
+                                                         if value["words"] is not None else None)
+                else:
+                    self.chunks_transcriptions[idx] = value
+            num_misses = self.chunks_transcriptions.count(None)
+            self.instrumentation.counter("cache_hits", self.num_chunks - num_misses, stage="asr")
+            self.instrumentation.counter("cache_misses", num_misses, stage="asr")
 
+        order = self._get_length_sorted_order([idx for idx, text in enumerate(self.chunks_transcriptions)
+                                               if text is None])
+        if len(order) != 0:
+            if self.chunks_arrays is not None:
+                sorted_transcriptions, sorted_words_timestamps = self._transcribe_arrays(order, batch_size=batch_size)
+            else:
+                with self.instrumentation.span("asr_batch", batch_size=len(order)):
+                    paths2chunks = [self.paths2chunks[idx] for idx in order]
+                    if self.return_timestamps:
+                        sorted_transcriptions, sorted_words_timestamps = self._decode_hypotheses(
+                            self.model.transcribe(paths2chunks, batch_size=batch_size, return_hypotheses=True)[0])
+                    else:
+                        sorted_transcriptions = self.model.transcribe(paths2chunks, batch_size=batch_size)[0]
+                        sorted_words_timestamps = [None] * len(order)
 
+            for idx, transcribed_text, words_timestamps in zip(order, sorted_transcriptions, sorted_words_timestamps):
+                self.chunks_transcriptions[idx] = transcribed_text
+                self.chunks_words_timestamps[idx] = words_timestamps
+                if cache_keys is not None:
+                    self.cache.put(cache_keys[idx], transcribed_text if not self.return_timestamps else
+                                   {"text": transcribed_text,
+                                    "words": words_timestamps.tolist() if words_timestamps is not None else None})
 
+        self.raw_transcriptions = [text for text in self.chunks_transcriptions if len(text) != 0]
+        self.transcription_duration = time.time() - transcribing_start_time
@@ -0,0 +1,143 @@
+"""
+Модуль содержит перевод аудио в текст в реальном времени: PCM данные поступают по мере записи (из генератора
+или сокета), чанки отрезаются по тишине по ходу поступления данных, каждый готовый чанк сразу распознается,
+а текст отдается сегментами - сначала "сырой" (partial), затем исправленный.
+"""
+import time
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional, Tuple, Union
+
+import numpy as np
+
+from .metrics import Instrumentation
+from .raw_transcription import RawTranscriptionModel
+from .streaming import StreamingAudio2Chunks
+from .utils import correct_cur_sent
+
+
+@dataclass
+class TranscriptSegment:
+    """
+    Сегмент текста, соответствующий одному чанку аудио.
+    Attributes:
+        start (float): Начало чанка в секундах от начала потока.
+        end (float): Конец чанка в секундах от начала потока.
+        text (str): Текст сегмента.
+        is_final (bool): False - "сырая" транскрипция (partial), True - исправленный текст. Исправленные тексты
+                         уже согласованы с предыдущим сегментом, поэтому их можно склеивать через пробел.
+    """
+    start: float
+    end: float
+    text: str
+    is_final: bool
+
+
+def iter_float32_blocks(pcm_blocks: Iterable[Union[bytes, np.ndarray]]) -> Iterator[np.ndarray]:
+    """
+    Приведение входящих PCM данных к блокам float32 в диапазоне [-1, 1].
+    Args:
+        pcm_blocks: Блоки 16K mono PCM: bytes (s16le, например, из сокета; границы блоков могут
+                    приходиться на середину сэмпла) или массивы numpy (int16 или float32).
+    Returns:
+        Генератор блоков float32.
+    """
+    remainder = b""
+    for block in pcm_blocks:
+        if isinstance(block, (bytes, bytearray, memoryview)):
+            data = remainder + bytes(block)
+            remainder = data[len(data) - len(data) % 2:]
+            block = np.frombuffer(data[:len(data) - len(remainder)], dtype=np.int16)
+        if block.dtype == np.int16:
+            block = block.astype(np.float32) / 32768
+        if len(block) != 0:
+            yield block.astype(np.float32, copy=False)
+
+
+class RealtimeTranscription:
+    """
+    Класс для перевода в текст аудио, поступающего в реальном времени, с помощью моделей, загруженных в Transcriber.
+    Чанк отдается на распознавание, как только после речи найдена пауза pause_split (или буфер превысил
+    max_chunk_duration), поэтому задержка до появления текста - порядка длины фразы.
+    """
+
+    def __init__(self,
+                 transcriber,
+                 max_chunk_duration: int = 10,
+                 pause_split: Optional[Tuple[int, int]] = (500, -16),
+                 correct_spelling: bool = True):
+        """
+        Инициализация.
+        Args:
+            transcriber (Transcriber): Transcriber с загруженными моделями и параметрами разбиения аудио.
+            max_chunk_duration (int): Максимальная длительность чанка в секундах (меньше - быстрее появляется текст).
+            pause_split (Tuple[int, int]): Пауза (min_silence_len в мс, silence_thresh в dB), после которой чанк
+                                           сразу отдается на распознавание (см. StreamingAudio2Chunks).
+            correct_spelling (bool): True, если после каждого partial сегмента нужно отдавать исправленный.
+        """
+        self.transcriber = transcriber
+        self.max_chunk_duration = max_chunk_duration
+        self.pause_split = pause_split
+        self.correct_spelling = correct_spelling
+        self.instrumentation = Instrumentation(transcriber.metrics_sinks)
+        self.first_text_latency = None  # время от начала потока до первого сегмента с текстом
+        self.audio_duration = None
+
+    def _transcribe_chunk(self, chunk_array: np.ndarray) -> str:
+        """
+        Первичное распознавание одного чанка.
+        """
+        nemo_model = RawTranscriptionModel(chunks_arrays=[chunk_array],
+                                           model=self.transcriber.asr_model,
+                                           cache=self.transcriber.cache,
+                                           instrumentation=self.instrumentation)
+        nemo_model.raw_transcription(batch_size=1)
+        return nemo_model.chunks_transcriptions[0]
+
+    def _correct_sentence(self, sentence: str) -> str:
+        """
+        Правка текста одного чанка.
+        """
+        speller = self.transcriber.make_speller([sentence], instrumentation=self.instrumentation,
+                                                batch_size=1, max_batch_tokens=None)
+        return speller.correct_spelling()[0]
+
+    def run(self, pcm_blocks: Iterable[Union[bytes, np.ndarray]]) -> Iterator[TranscriptSegment]:
+        """
+        Перевод аудио в текст по мере поступления данных.
+        Args:
+            pcm_blocks: Блоки 16K mono PCM (bytes s16le или массивы numpy int16/float32) в порядке записи.
+
+        Returns:
+            Генератор сегментов: для каждого чанка с речью - partial сегмент, а затем (если correct_spelling)
+            исправленный сегмент с теми же границами.
+        """
+        stream_start_time = time.time()
+        transcriber = self.transcriber
+        audio_splitter = StreamingAudio2Chunks(pcm_blocks=iter_float32_blocks(pcm_blocks),
+                                               verbose=transcriber.verbose,
+                                               max_chunk_duration=self.max_chunk_duration,
+                                               split_levels=transcriber.split_levels,
+                                               lookahead_duration=0,
+                                               pause_split=self.pause_split,
+                                               speech_filter=transcriber.speech_filter,
+                                               instrumentation=self.instrumentation)
+        prev_sentence = None
+        for (start, end), chunk_array in audio_splitter.iter_chunks():
+            raw_text = self._transcribe_chunk(chunk_array)
+            if len(raw_text) == 0:
+                continue
+            if self.first_text_latency is None:
+                self.first_text_latency = time.time() - stream_start_time
+            start, end = start / audio_splitter.frame_rate, end / audio_splitter.frame_rate
+            yield TranscriptSegment(start=start, end=end, text=raw_text, is_final=False)
+
+            if self.correct_spelling:
+                sentence = self._correct_sentence(raw_text)
+                if len(sentence) == 0:
+                    continue
+                text = correct_cur_sent(prev_sentence, sentence) if prev_sentence is not None else sentence
+                prev_sentence = sentence
+                yield TranscriptSegment(start=start, end=end, text=text, is_final=True)
+
+        self.audio_duration = audio_splitter.audio_duration
+        self.instrumentation.flush()
@@ -0,0 +1,210 @@
+"""
+Модуль содержит векторизованный (numpy) поиск участков тишины в аудио.
+Результаты совпадают с pydub.silence.detect_silence (seek_step=1), но энергия сигнала считается один раз для всего
+аудио, а запросы для любых отрезков и любых (min_silence_len, silence_thresh) отвечаются по предпосчитанным
+кумулятивным суммам.
+"""
+import math
+from typing import List
+
+import numpy as np
+
+MAX_POSSIBLE_AMPLITUDE = 32768.0  # 16 bit
+SLAB_SIZE = 1 << 16  # число блоков/окон, обрабатываемых за раз (временные массивы - несколько MB)
+
+
+def ms_to_frame(ms: float, num_frames: int, frame_rate: int) -> int:
+    """
+    Перевод позиции в миллисекундах в номер сэмпла так же, как это делает AudioSegment.__getitem__.
+    Args:
+        ms: Позиция в миллисекундах относительно начала отрезка.
+        num_frames: Число сэмплов в отрезке.
+        frame_rate: Частота дискретизации.
+    Returns: Номер сэмпла относительно начала отрезка (может превышать num_frames, как и в pydub).
+    """
+    len_ms = round(1000 * (num_frames / frame_rate))
+    return int(min(ms, len_ms) * (frame_rate / 1000.0))
+
+
+def ratio_to_db(ratio: float) -> float:
+    """
+    Перевод отношения амплитуд в dB (как pydub.utils.ratio_to_db).
+    """
+    if ratio == 0:
+        return -float("inf")
+    return 20 * math.log(ratio, 10)
+
+
+def db_to_float(db: float) -> float:
+    """
+    Перевод dB в отношение амплитуд (как pydub.utils.db_to_float).
+    """
+    return 10 ** (db / 20)
+
+
+class SilenceDetector:
+    """
+    Класс для поиска участков тишины. Хранит кумулятивную энергию сигнала по блокам в 1 мс,
+    энергия произвольного отрезка досчитывается по сэмплам на краях блоков.
+    Для потоковой обработки сигнал можно дополнять в конце (append) и отбрасывать в начале (discard),
+    энергия при этом досчитывается только для новых блоков.
+    """
+
+    def __init__(self, samples: np.ndarray, frame_rate: int = 16000):
+        """
+        Предподсчет энергии сигнала.
+        Args:
+            samples (np.ndarray): Сигнал (mono, float32 в диапазоне [-1, 1], полученный из 16 bit PCM).
+            frame_rate (int): Частота дискретизации.
+        """
+        self.samples = samples
+        self.frame_rate = frame_rate
+        self.num_frames = len(samples)
+        self.block_size = frame_rate // 1000
+        self.cumulative_energy = np.zeros(1, dtype=np.int64)
+        self._extend_energy()
+
+    def _extend_energy(self):
+        """
+        Досчет кумулятивной энергии для блоков, которые еще не учтены (все полные блоки self.samples).
+        """
+        first_block = len(self.cumulative_energy) - 1
+        num_blocks = self.num_frames // self.block_size
+        if num_blocks == first_block:
+            return
+        cumulative_energy = np.empty(num_blocks + 1, dtype=np.int64)
+        cumulative_energy[:first_block + 1] = self.cumulative_energy
+        for slab_start in range(first_block, num_blocks, SLAB_SIZE):
+            slab_end = min(slab_start + SLAB_SIZE, num_blocks)
+            squares = self._squares(self.samples[slab_start * self.block_size: slab_end * self.block_size])
+            cumulative_energy[slab_start + 1: slab_end + 1] = squares.reshape(-1, self.block_size).sum(axis=1)
+        np.cumsum(cumulative_energy[first_block:], out=cumulative_energy[first_block:])
+        self.cumulative_energy = cumulative_energy
+
+    def append(self, samples: np.ndarray):
+        """
+        Дополнение сигнала в конце.
+        Args:
+            samples (np.ndarray): Новые сэмплы (mono, float32).
+        """
+        self.samples = np.concatenate((self.samples, samples))
+        self.num_frames = len(self.samples)
+        self._extend_energy()
+
+    def discard(self, num_frames: int):
+        """
+        Отбрасывание первых num_frames сэмплов сигнала (позиции после этого отсчитываются от нового начала).
+        """
+        self.samples = self.samples[num_frames:]
+        self.num_frames = len(self.samples)
+        blocks, remainder = divmod(num_frames, self.block_size)
+        if remainder == 0:
+            self.cumulative_energy = self.cumulative_energy[blocks:] - self.cumulative_energy[blocks]
+        else:  # границы блоков сдвигаются, поэтому энергия пересчитывается
+            self.cumulative_energy = np.zeros(1, dtype=np.int64)
+            self._extend_energy()
+
+    @staticmethod
+    def _squares(samples: np.ndarray) -> np.ndarray:
+        """
+        Квадраты 16 bit значений сэмплов (целочисленно, поэтому суммы точные).
+        """
+        values = np.rint(samples * MAX_POSSIBLE_AMPLITUDE).astype(np.int64)
+        return values * values
+
+    def _prefix_energy(self, positions: np.ndarray) -> np.ndarray:
+        """
+        Энергия (сумма квадратов) сигнала от начала до каждой из позиций.
+        Args:
+            positions: Номера сэмплов (0 <= position <= num_frames).
+        Returns: Массив энергий int64.
+        """
+        blocks, remainders = np.divmod(positions, self.block_size)
+        energy = self.cumulative_energy[blocks]
+        for offset in range(self.block_size - 1):
+            mask = remainders > offset
+            if not mask.any():
+                break
+            energy[mask] += self._squares(self.samples[blocks[mask] * self.block_size + offset])
+        return energy
+
+    def energy(self, start: int, end: int) -> int:
+        """
+        Энергия сигнала на отрезке [start, end) в сэмплах.
+        """
+        return int(np.diff(self._prefix_energy(np.array([start, end], dtype=np.int64)))[0])
+
+    def dbfs(self, start: int = 0, end: int = None) -> float:
+        """
+        Громкость отрезка в dBFS (как AudioSegment.dBFS).
+        Args:
+            start: Начало отрезка в сэмплах.
+            end: Конец отрезка в сэмплах. Если None, то до конца аудио.
+        """
+        end = self.num_frames if end is None else end
+        if end <= start:
+            return -float("inf")
+        rms = int(math.sqrt(self.energy(start, end) / (end - start)))
+        return ratio_to_db(rms / MAX_POSSIBLE_AMPLITUDE)
+
+    def _window_rms(self, start: int, end: int, window_starts: np.ndarray, min_silence_len: int) -> np.ndarray:
+        """
+        RMS окон длиной min_silence_len мс, начинающихся в window_starts мс от начала отрезка [start, end).
+        Окна, выходящие за конец отрезка, дополняются нулями (как в pydub).
+        """
+        num_frames = end - start
+        ms_to_frames = self.frame_rate / 1000.0
+        window_start_frames = (window_starts * ms_to_frames).astype(np.int64)
+        window_end_frames = ((window_starts + min_silence_len) * ms_to_frames).astype(np.int64)
+
+        energy = (self._prefix_energy(start + np.minimum(window_end_frames, num_frames)) -
+                  self._prefix_energy(start + np.minimum(window_start_frames, num_frames)))
+        return np.floor(np.sqrt(energy / (window_end_frames - window_start_frames)))
+
+    def detect_silence(self, start: int, end: int, min_silence_len: int, silence_thresh: float) -> List[List[int]]:
+        """
+        Поиск участков тишины на отрезке аудио (аналог pydub.silence.detect_silence с seek_step=1).
+        Args:
+            start (int): Начало отрезка в сэмплах.
+            end (int): Конец отрезка в сэмплах.
+            min_silence_len (int): Минимальная длина для промежутка тишины (мс).
+            silence_thresh (float): Фрагменты аудио с амплитудой меньше *silence_thresh* dBFS будут считаться тишиной.
+
+        Returns:
+            Список участков тишины [start, stop] в миллисекундах относительно начала отрезка.
+        """
+        seg_len = round(1000 * ((end - start) / self.frame_rate))
+        if seg_len < min_silence_len:
+            return []
+        silence_thresh = db_to_float(silence_thresh) * MAX_POSSIBLE_AMPLITUDE
+
+        last_slice_start = seg_len - min_silence_len
+        silence_starts = []
+        for slab_start in range(0, last_slice_start + 1, SLAB_SIZE):
+            window_starts = np.arange(slab_start, min(slab_start + SLAB_SIZE, last_slice_start + 1), dtype=np.int64)
+            rms = self._window_rms(start, end, window_starts, min_silence_len)
+            silence_starts.append(window_starts[rms <= silence_thresh])
+        silence_starts = np.concatenate(silence_starts)
+        if len(silence_starts) == 0:
+            return []
+
+        # Соседние окна тишины объединяются, если между ними нет промежутка длиннее min_silence_len
+        gaps = np.flatnonzero(np.diff(silence_starts) > min_silence_len)
+        range_starts = silence_starts[np.concatenate(([0], gaps + 1))]
+        range_ends = silence_starts[np.concatenate((gaps, [len(silence_starts) - 1]))] + min_silence_len
+        return [[int(range_start), int(range_end)] for range_start, range_end in zip(range_starts, range_ends)]
+
+    def lowest_energy_point(self, start: int, end: int, window_len: int = 50) -> int:
+        """
+        Поиск точки с наименьшей энергией сигнала (в окне длиной window_len мс вокруг точки).
+        Args:
+            start (int): Начало отрезка поиска в сэмплах.
+            end (int): Конец отрезка поиска в сэмплах.
+            window_len (int): Длина окна в мс.
+        Returns: Номер сэмпла (кандидаты берутся с шагом 1 мс).
+        """
+        half_window = window_len * self.block_size // 2
+        positions = np.arange(start, max(end, start + 1), self.block_size, dtype=np.int64)
+        energy = (self._prefix_energy(np.minimum(positions + half_window, self.num_frames)) -
+                  self._prefix_energy(np.maximum(positions - half_window, 0)))
+        return int(positions[np.argmin(energy)])
@@ -2,12 +2,67 @@
 Модуль содержит в себе класс для правки "сырого" текста, полученного путем первичной
 транскрибации, и расставления в нем пунктуации.
 """
+import json
+import math
 import time
 import torch
-from typing import List, Union
-from transformers import AutoModelForSeq2SeqLM, T5TokenizerFast
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from transformers import AutoModelForSeq2SeqLM, PreTrainedModel, T5TokenizerFast
+
+from .backends import get_backend
+from .cache import TranscriptionCache
+from .metrics import Instrumentation
+from .utils import concatenate_sentences, light_punctuation
+
+SPELLING_CORRECTION_MODEL = 'UrukHan/t5-russian-spell'
+TASK_PREFIX = "Spell correct: "
+MIN_NEW_TOKENS = 8  # запас к max_new_tokens для коротких входов
+
+
+class CorrectionGate:
+    """
+    Отбор предложений, которым нужна правка T5. Остальные предложения получают только легкую правку
+    (заглавная буква и знак препинания в конце, см. utils.light_punctuation), что намного быстрее генерации T5.
+    Если задан словарь (lexicon), то T5 правит предложения, в которых доля слов не из словаря больше max_oov_ratio.
+    Иначе T5 правит предложения длиннее max_words слов (в коротких репликах, как правило, нечего исправлять,
+    кроме регистра и точки в конце).
+    """
+
+    def __init__(self, lexicon: Optional[Iterable[str]] = None, max_words: int = 3, max_oov_ratio: float = 0.0):
+        """
+        Args:
+            lexicon (Iterable[str]): Словарь правильно написанных слов (например, словоформы из частотного словаря).
+            max_words (int): Максимальное число слов в предложении без правки T5 (если lexicon не задан).
+            max_oov_ratio (float): Максимальная доля слов не из словаря в предложении без правки T5.
+        """
+        self.lexicon = {self._normalize(word) for word in lexicon} if lexicon is not None else None
+        self.max_words = max_words
+        self.max_oov_ratio = max_oov_ratio
+
+    @classmethod
+    def from_file(cls, path2lexicon: str, **kwargs) -> "CorrectionGate":
+        """
+        Загрузка словаря из текстового файла (слово - первое поле строки, остальные поля, например, частоты,
+        игнорируются).
+        """
+        with open(path2lexicon, encoding="utf-8") as file:
+            lexicon = [line.split(maxsplit=1)[0] for line in file if line.strip()]
+        return cls(lexicon=lexicon, **kwargs)
+
+    @staticmethod
+    def _normalize(word: str) -> str:
+        return word.lower().replace("ё", "е")
+
+    def needs_correction(self, sentence: str) -> bool:
+        """
+        True, если предложению нужна правка T5.
+        """
+        words = sentence.split()
+        if self.lexicon is None:
+            return len(words) > self.max_words
+        num_oov = sum(self._normalize(word) not in self.lexicon for word in words)
+        return num_oov > self.max_oov_ratio * len(words)
 
-from .utils import correct_cur_sent
 
 class SpellingCorrector:
     """
@@ -17,7 +72,17 @@ class SpellingCorrector:
                  raw_sentences: List[str],
                  device: torch.device,
                  concat_sentences: bool = True,
-                 max_input: int = 256):
+                 max_input: int = 256,
+                 tokenizer: Optional[T5TokenizerFast] = None,
+                 model: Optional[PreTrainedModel] = None,
+                 batch_size: int = 8,
+                 max_batch_tokens: Optional[int] = 4096,
+                 cache: Optional[TranscriptionCache] = None,
+                 gate: Optional[CorrectionGate] = None,
+                 num_beams: int = 1,
+                 beam_max_tokens: Optional[int] = None,
+                 max_new_tokens_ratio: Optional[float] = None,
+                 instrumentation: Optional[Instrumentation] = None):
         """
         Инициализация токенизатора и модели для правки текста и расставления пунктуации.
         Args:
@@ -25,50 +90,224 @@ class SpellingCorrector:
             device (torch.device): GPU или CPU.
             concat_sentences (bool): True, если требуется сконкатенировать предложения в одно, False иначе.
             max_input (int): Максимальная длина входной последовательности (256 - максимум в данном случае).
+            tokenizer (T5TokenizerFast): Уже загруженный токенизатор. Если None, то загружается вместе с моделью.
+            model (PreTrainedModel): Уже загруженная модель (должна находиться на device).
+                                     Если None, то загружается вместе с токенизатором.
+            batch_size (int): Максимальное число последовательностей в batch-е.
+            max_batch_tokens (int): Максимальное число токенов в batch-е с учетом padding-а
+                                    (batch_size * длина самой длинной последовательности). None - без ограничения.
+            cache (TranscriptionCache): Кэш исправленных предложений. Если задан, то правятся только предложения,
+                                        которых нет в кэше.
+            gate (CorrectionGate): Если задан, то T5 правит только отобранные им предложения, остальные получают
+                                   легкую правку без модели. None - T5 правит все предложения.
+            num_beams (int): Число лучей beam search (1 - greedy).
+            beam_max_tokens (int): Beam search используется только для batch-ей, в которых самая длинная
+                                   последовательность не длиннее beam_max_tokens токенов (длинные - greedy).
+                                   None - для всех batch-ей.
+            max_new_tokens_ratio (float): Если задано, то длина генерации ограничена max_new_tokens_ratio * длина
+                                          самой длинной последовательности batch-а + MIN_NEW_TOKENS.
+                                          None - ограничение из конфигурации модели.
+            instrumentation (Instrumentation): Сборщик метрик (интервал на каждый batch, попадания в кэш).
         """
-        SPELLING_CORRECTION_MODEL = 'UrukHan/t5-russian-spell'
+        if tokenizer is None or model is None:
+            tokenizer, model = self.load_model(device)
 
-        self.tokenizer = T5TokenizerFast.from_pretrained(SPELLING_CORRECTION_MODEL)
-        self.model = AutoModelForSeq2SeqLM.from_pretrained(SPELLING_CORRECTION_MODEL)
+        self.tokenizer = tokenizer
+        self.model = model
         self.raw_sentences = raw_sentences
         self.spelling_corrected_sentences: List[str] = []
         self.spelling_correction_duration = None
         self.concat = concat_sentences
         self.max_input = max_input
         self.device = device
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.cache = cache
+        self.gate = gate
+        self.num_beams = num_beams
+        self.beam_max_tokens = beam_max_tokens
+        self.max_new_tokens_ratio = max_new_tokens_ratio
+        self.instrumentation = instrumentation if instrumentation is not None else Instrumentation()
+
+    @staticmethod
+    def load_tokenizer() -> T5TokenizerFast:
+        """
+        Загрузка токенизатора для правки текста (без модели, например, для T5 в ONNX Runtime).
+        """
+        return T5TokenizerFast.from_pretrained(SPELLING_CORRECTION_MODEL)
+
+    @staticmethod
+    def load_model(device: torch.device) -> Tuple[T5TokenizerFast, PreTrainedModel]:
+        """
+        Загрузка токенизатора и модели для правки текста.
+        Args:
+            device (torch.device): GPU или CPU, на которое переносится модель.
+        Returns: Токенизатор и модель в режиме eval.
+        """
+        tokenizer = SpellingCorrector.load_tokenizer()
+        model = AutoModelForSeq2SeqLM.from_pretrained(SPELLING_CORRECTION_MODEL).to(device)
+        return tokenizer, model.eval()
 
     def _concatenate_sentences(self) -> str:
         """
         Конкатенация исправленных предложений.
         """
-        concat_sentence = self.spelling_corrected_sentences[0]
-        prev_sent = self.spelling_corrected_sentences[0]
-        for cur_sent in self.spelling_corrected_sentences[1:]:
-            concat_sentence += " " + correct_cur_sent(prev_sent, cur_sent)
-            prev_sent = cur_sent
+        return concatenate_sentences(self.spelling_corrected_sentences)
 
-        return concat_sentence
+    def _get_cache_key(self, sentence: str) -> str:
+        """
+        Ключ кэша для предложения: хэш текста, модели (с бэкендом) и параметров генерации.
+        """
+        generation_config = json.dumps({"max_input": self.max_input,
+                                        "num_beams": self.num_beams,
+                                        "beam_max_tokens": self.beam_max_tokens,
+                                        "max_new_tokens_ratio": self.max_new_tokens_ratio}, sort_keys=True)
+        backend = get_backend(self.model)
+        model_id = SPELLING_CORRECTION_MODEL if backend == "eager" else f"{SPELLING_CORRECTION_MODEL}:{backend}"
+        return TranscriptionCache.make_key(model_id, generation_config, sentence)
 
-    def correct_spelling(self) -> Union[List, str]:
+    def _get_input_lengths(self, texts: List[str]) -> List[int]:
         """
-        Функция правит текст и расставляет в нем пунктуацию.
-        Returns: поправленный текст с расставленной пунктуацией.
+        Длины входных последовательностей (в токенах, с учетом префикса задачи и специальных токенов).
         """
-        correct_spelling_start_time = time.time()
+        if len(texts) == 0:
+            return []
+        return [len(input_ids) for input_ids in self.tokenizer([TASK_PREFIX + text for text in texts])["input_ids"]]
+
+    def _split_long_sentence(self, sentence: str) -> List[str]:
+        """
+        Разбиение предложения, не помещающегося в max_input токенов, на части по границам слов
+        (чтобы текст не терялся при truncation).
+        Args:
+            sentence: Предложение.
+        Returns: Части предложения, каждая из которых помещается в max_input токенов.
+        """
+        budget = self.max_input - self._get_input_lengths([""])[0]
+        words = sentence.split()
+        words_lengths = [len(input_ids) for input_ids in
+                         self.tokenizer(words, add_special_tokens=False)["input_ids"]]
+
+        pieces = []
+        piece_words = []
+        piece_length = 0
+        for word, word_length in zip(words, words_lengths):
+            if piece_words and piece_length + word_length > budget:
+                pieces.append(" ".join(piece_words))
+                piece_words = []
+                piece_length = 0
+            piece_words.append(word)
+            piece_length += word_length
+        pieces.append(" ".join(piece_words))
+        return pieces
+
+    def _make_batches(self, lengths: List[int]) -> List[List[int]]:
+        """
+        Разбиение последовательностей на batch-и по длине: последовательности сортируются по числу токенов,
+        поэтому padding внутри batch-а минимален.
+        Args:
+            lengths: Длины последовательностей в токенах.
+        Returns: Batch-и индексов последовательностей.
+        """
+        batches = []
+        batch = []
+        for idx in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+            batch_tokens = (len(batch) + 1) * lengths[idx]
+            if batch and (len(batch) == self.batch_size or
+                          (self.max_batch_tokens is not None and batch_tokens > self.max_batch_tokens)):
+                batches.append(batch)
+                batch = []
+            batch.append(idx)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _get_generation_kwargs(self, max_length: int) -> Dict[str, int]:
+        """
+        Параметры генерации для batch-а, в котором самая длинная последовательность - max_length токенов.
+        """
+        generation_kwargs = {}
+        if self.max_new_tokens_ratio is not None:
+            generation_kwargs["max_new_tokens"] = math.ceil(self.max_new_tokens_ratio * max_length) + MIN_NEW_TOKENS
+        if self.num_beams > 1 and (self.beam_max_tokens is None or max_length <= self.beam_max_tokens):
+            generation_kwargs["num_beams"] = self.num_beams
+        return generation_kwargs
 
-        # Tokenizing
-        task_prefix = "Spell correct: "
+    def _correct_batch(self, texts: List[str]) -> List[str]:
+        """
+        Правка одного batch-а последовательностей.
+        """
         encoded = self.tokenizer(
-            [task_prefix + sequence for sequence in self.raw_sentences],
+            [TASK_PREFIX + text for text in texts],
             padding="longest",
             max_length=self.max_input,
             truncation=True,
             return_tensors="pt",
         )
+        input_tokens = int(encoded["attention_mask"].sum())
+        generation_kwargs = self._get_generation_kwargs(encoded["input_ids"].shape[1])
+        with self.instrumentation.span("t5_batch",
+                                       batch_size=len(texts),
+                                       input_tokens=input_tokens,
+                                       padding_ratio=1 - input_tokens / encoded["input_ids"].numel(),
+                                       **generation_kwargs) as span:
+            generate_start_time = time.perf_counter()
+            predicts = self.model.generate(**encoded.to(self.device), **generation_kwargs)
+            generate_duration = time.perf_counter() - generate_start_time
+            span["output_tokens"] = predicts.numel()
+            span["tokens_per_second"] = predicts.numel() / generate_duration if generate_duration > 0 else None
+        return self.tokenizer.batch_decode(predicts, skip_special_tokens=True)
 
-        # Predict and decode
-        predicts = self.model.generate(**encoded.to(self.device))
-        self.spelling_corrected_sentences = self.tokenizer.batch_decode(predicts, skip_special_tokens=True)
+    def correct_spelling(self) -> Union[List, str]:
+        """
+        Функция правит текст и расставляет в нем пунктуацию.
+        Предложения обрабатываются batch-ами близкой длины (mini-batching с сортировкой по длине),
+        а затем возвращаются в исходный порядок. Если задан gate, то предложения, не отобранные им для T5
+        (и отсутствующие в кэше), получают только легкую правку.
+        Returns: поправленный текст с расставленной пунктуацией.
+        """
+        correct_spelling_start_time = time.time()
+
+        self.spelling_corrected_sentences = [None] * len(self.raw_sentences)
+        cache_keys = None
+        if self.cache is not None:
+            cache_keys = [self._get_cache_key(sentence) for sentence in self.raw_sentences]
+            self.spelling_corrected_sentences = [self.cache.get(key) for key in cache_keys]
+            num_misses = self.spelling_corrected_sentences.count(None)
+            self.instrumentation.counter("cache_hits", len(cache_keys) - num_misses, stage="t5")
+            self.instrumentation.counter("cache_misses", num_misses, stage="t5")
+        missing = [idx for idx, sentence in enumerate(self.spelling_corrected_sentences) if sentence is None]
+        if self.gate is not None:
+            num_missing = len(missing)
+            for idx in missing:
+                if not self.gate.needs_correction(self.raw_sentences[idx]):
+                    self.spelling_corrected_sentences[idx] = light_punctuation(self.raw_sentences[idx])
+            missing = [idx for idx in missing if self.spelling_corrected_sentences[idx] is None]
+            self.instrumentation.counter("correction_gate_sentences", len(missing), action="t5")
+            self.instrumentation.counter("correction_gate_sentences", num_missing - len(missing), action="light")
+        missing_sentences = [self.raw_sentences[idx] for idx in missing]
+
+        # Long sentences are split on pieces fitting into max_input tokens
+        pieces = []
+        pieces_sentence_idx = []
+        for sentence_idx, (sentence, length) in enumerate(zip(missing_sentences,
+                                                              self._get_input_lengths(missing_sentences))):
+            sentence_pieces = self._split_long_sentence(sentence) if length > self.max_input else [sentence]
+            pieces.extend(sentence_pieces)
+            pieces_sentence_idx.extend([sentence_idx] * len(sentence_pieces))
+
+        # Predict and decode by length-sorted batches
+        corrected_pieces = [""] * len(pieces)
+        for batch in self._make_batches(self._get_input_lengths(pieces)):
+            for idx, corrected_piece in zip(batch, self._correct_batch([pieces[idx] for idx in batch])):
+                corrected_pieces[idx] = corrected_piece
+
+        sentences_pieces = [[] for _ in missing_sentences]
+        for sentence_idx, corrected_piece in zip(pieces_sentence_idx, corrected_pieces):
+            sentences_pieces[sentence_idx].append(corrected_piece)
+        for idx, sentence_pieces in zip(missing, sentences_pieces):
+            self.spelling_corrected_sentences[idx] = concatenate_sentences(sentence_pieces)
+            if cache_keys is not None:
+                self.cache.put(cache_keys[idx], self.spelling_corrected_sentences[idx])
 
         if self.concat:
             output_sentence = self._concatenate_sentences()
@@ -77,4 +316,3 @@ class SpellingCorrector:
         else:
             self.spelling_correction_duration = time.time() - correct_spelling_start_time
             return self.spelling_corrected_sentences
-
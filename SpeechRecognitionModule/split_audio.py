@@ -5,155 +5,246 @@
 """
 import os
 import time
-from typing import List
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
 
 from .exceptions import NoSilenceFoundError
+from .ingest import DecodedAudioCache, load_pcm, write_wav
+from .metrics import Instrumentation
+from .silence import SilenceDetector, ms_to_frame
+from .vad import SpeechFilter
 
-from pydub import AudioSegment, silence
+# Уровни разбиения (min_silence_len в мс, silence_thresh в dB относительно громкости всего аудио).
+# С каждым уровнем условия на "тишину" ослабляются.
+DEFAULT_SPLIT_LEVELS = ((1500, -20), (1100, -20), (800, -20), (500, -16))
 
 
 class Audio2Chunks:
     """
     Класс позволяет привести аудио к нужному формату (16К mono wav) и затем разбить его на части
-    (длина каждой из которых ограничена) по участкам тишины, которые в основном семантически возникают на стыке предложений.
+    (длина каждой из которых ограничена) по участкам тишины, которые в основном семантически возникают
+    на стыке предложений.
     Эти части далее называются **чанками (chunks)**.
     """
 
-    def __init__(self, path2audio: str, max_chunk_duration: int = 150, verbose: int = 0):
+    def __init__(self,
+                 path2audio: str,
+                 max_chunk_duration: int = 150,
+                 verbose: int = 0,
+                 split_levels: Sequence[Tuple[int, int]] = DEFAULT_SPLIT_LEVELS,
+                 force_split: bool = True,
+                 merge_target_duration: Optional[float] = None,
+                 speech_filter: Optional[SpeechFilter] = None,
+                 audio_cache: Optional[DecodedAudioCache] = None,
+                 instrumentation: Optional[Instrumentation] = None):
         """
         Инициализация класса.
         Args:
             path2audio (str): Путь до аудио, которое нужно разбить на чанки.
             max_chunk_duration (int): Максимальная длительность чанка в секундах.
             verbose (int): Уровень подробности. Если =2, то выводить промежуточные данные.
+            split_levels (Sequence[Tuple[int, int]]): Уровни разбиения - пары (min_silence_len в мс,
+                                                      silence_thresh в dB относительно громкости всего аудио).
+            force_split (bool): True, если чанки, не разбившиеся на последнем уровне, нужно принудительно разбивать
+                                в точке с наименьшей энергией, False - выбрасывать NoSilenceFoundError.
+            merge_target_duration (float): Если задано, то соседние короткие чанки сливаются до этой длительности.
+            speech_filter (SpeechFilter): Если задан, то чанки без речи отбрасываются, а тишина в начале и в конце
+                                          чанков обрезается (см. vad.py).
+            audio_cache (DecodedAudioCache): Кэш декодированных аудио (для аудио, которые нельзя прочитать
+                                             напрямую как 16K mono WAV).
+            instrumentation (Instrumentation): Сборщик метрик (интервалы decode, silence_detection и счетчики чанков).
         """
         self.path2audio = path2audio
         self.audio_duration = None
-        self.audio = None
+        self.samples = None
+        self.frame_rate = 16000
+        self.silence_detector = None
+        self.reference_dbfs = None
         self.verbose = verbose
         self.chunks = []
         self.chunks_durations = []
+        self.chunks_arrays: List[np.ndarray] = []
         self.paths2chunks: List[str] = []
         self.max_chunk_duration = max_chunk_duration
+        self.split_levels = split_levels
+        self.force_split = force_split
+        self.merge_target_duration = merge_target_duration
+        self.speech_filter = speech_filter
+        self.audio_cache = audio_cache
         self.split_audio_duration = None
+        self.instrumentation = instrumentation if instrumentation is not None else Instrumentation()
 
     def load_audio(self):
         """
-        Считывание аудиофайла и его преобразование к необходимому формату.
+        Считывание аудиофайла и его преобразование к необходимому формату (16K mono float32, см. ingest.py).
         """
-        self.audio = AudioSegment.from_file(self.path2audio)
-
-        # Set to 16K mono wav format (because Nemo Model can accept only this!)
-        self.audio = self.audio.set_frame_rate(16000)
-        self.audio = self.audio.set_channels(1)
-        self.audio = self.audio.set_sample_width(2)
-        self.audio_duration = self.audio.duration_seconds
+        with self.instrumentation.span("decode") as span:
+            # Единый буфер float32 (16K mono, because Nemo Model can accept only this!), чанки в памяти являются
+            # view на него. Для 16K mono WAV и аудио из кэша буфер - memory map файла только для чтения.
+            self.samples, span["source"] = load_pcm(self.path2audio, frame_rate=self.frame_rate, cache=self.audio_cache)
+            self.audio_duration = len(self.samples) / self.frame_rate
+            if self.audio_cache is not None and span["source"] != "wav":
+                self.instrumentation.counter("cache_hits" if span["source"] == "cache" else "cache_misses",
+                                             stage="decode")
+            self.silence_detector = SilenceDetector(self.samples, frame_rate=self.frame_rate)
+            self.reference_dbfs = self.silence_detector.dbfs()
+            span["audio_duration"] = self.audio_duration
 
-    def _get_chunks_for_given_audio(self, sample_audio, min_silence_len, silence_thresh):
+    def _get_chunks_for_given_audio(self, start, end, min_silence_len, silence_thresh):
         """
-        Функция находит чанки для произвольного аудио. Причем не ограничивает их по длине.
+        Функция находит чанки для произвольного отрезка аудио. Причем не ограничивает их по длине.
         Args:
-            sample_audio (AudioSegment): Аудио, которое надо разбить на чанки.
+            start (int): Начало отрезка аудио, которое надо разбить на чанки (в сэмплах).
+            end (int): Конец отрезка аудио (в сэмплах).
             min_silence_len (int): Минимальная длина для промежутка тишины.
             silence_thresh: (int): Фрагменты аудио с амплитудой меньше *silence_thresh* dBFS будут считаться тишиной.
 
         Returns:
-            Чанки, полученные разделением аудио по участкам тишины.
+            Чанки (пары (start, end) в сэмплах), полученные разделением аудио по участкам тишины, и их длительности.
         """
-        silence_thresh = self.audio.dBFS + silence_thresh
-        silence_sectors = silence.detect_silence(audio_segment=sample_audio,
-                                                 min_silence_len=min_silence_len,
-                                                 silence_thresh=silence_thresh)
-        silence_sectors = [((start / 1000), (stop / 1000)) for start, stop in silence_sectors]  # convert to sec
+        silence_thresh = self.reference_dbfs + silence_thresh
+        silence_sectors = self.silence_detector.detect_silence(start=start,
+                                                               end=end,
+                                                               min_silence_len=min_silence_len,
+                                                               silence_thresh=silence_thresh)
+        silence_sectors = [((silence_start / 1000), (silence_stop / 1000))
+                           for silence_start, silence_stop in silence_sectors]  # convert to sec
         split_times = [round((items[0] + items[1]) / 2, 2) for items in silence_sectors]  # choose middle time point
 
+        # Границы чанков в сэмплах считаются так же, как при срезах AudioSegment
+        num_frames = end - start
+        sample_duration = num_frames / self.frame_rate
+
         chunks = []
         chunks_durations = []
         start_time = 0
         for i, end_time in enumerate(split_times):
-            chunk = sample_audio[start_time * 1000: end_time * 1000]
-            chunks.append(chunk)
+            chunk_start = start + ms_to_frame(start_time * 1000, num_frames, self.frame_rate)
+            chunk_end = start + ms_to_frame(end_time * 1000, num_frames, self.frame_rate)
+            chunks.append((chunk_start, min(chunk_end, end)))
             chunks_durations.append(round((end_time - start_time), 2))
             start_time = end_time
 
-        chunks.append(sample_audio[start_time * 1000: sample_audio.duration_seconds * 1000])
-        chunks_durations.append(round((sample_audio.duration_seconds - start_time), 2))
+        chunk_start = start + ms_to_frame(start_time * 1000, num_frames, self.frame_rate)
+        chunk_end = start + ms_to_frame(sample_duration * 1000, num_frames, self.frame_rate)
+        chunks.append((chunk_start, min(chunk_end, end)))
+        chunks_durations.append(round((sample_duration - start_time), 2))
         return chunks, chunks_durations
 
-    def get_chunks(self):
+    def _get_chunk_duration(self, chunk) -> float:
         """
-        Функция разбивает исходное аудио на чанки, ограниченные по продолжительности.
-        Делается это в 4 этапа, где с каждым этапом, условия на "тишину" ослабляются, тем самым, чанки, которые на
-        предыдущем этапе не смогли уложиться в ограничения по продолжительности, начинают укладываться в них.
-
-        Если по достижении последнего этапа чанк не укладывается в рамки продолжительности, то аудио считается
-        неразделимым на ограниченные чанки. Потому что последнее ограничение очень "мягкое".
+        Длительность чанка (start, end) в секундах.
+        """
+        return (chunk[1] - chunk[0]) / self.frame_rate
 
+    def _force_split(self, chunk):
+        """
+        Принудительное разбиение чанка в точке с наименьшей энергией сигнала. Точка выбирается во второй половине
+        допустимой длины, поэтому левая часть укладывается в ограничение и не получается слишком короткой.
+        Args:
+            chunk (Tuple[int, int]): Чанк (start, end) в сэмплах.
         Returns:
-            Ограниченные по времени чанки, на которые разделилось исходное аудио.
+            Левая (ограниченная по длине) и правая части чанка.
         """
+        start, end = chunk
+        max_chunk_frames = int(self.max_chunk_duration * self.frame_rate)
+        split_point = self.silence_detector.lowest_energy_point(start + max_chunk_frames // 2,
+                                                                start + max_chunk_frames)
+        return (start, split_point), (split_point, end)
 
-        # 1 level chunks
-        if self.audio_duration > self.max_chunk_duration:
+    def _split_chunk(self, chunk, chunk_duration, level: int = 0):
+        """
+        Рекурсивное разбиение чанка. Если чанк не укладывается в ограничение по продолжительности, то он разбивается
+        по участкам тишины с параметрами уровня level, а получившиеся части - с параметрами следующих уровней.
+        Args:
+            chunk (Tuple[int, int]): Чанк (start, end) в сэмплах.
+            chunk_duration (float): Продолжительность чанка в секундах.
+            level (int): Номер уровня в self.split_levels.
+        """
+        if self._get_chunk_duration(chunk) <= self.max_chunk_duration:
+            self.chunks.append(chunk)
+            self.chunks_durations.append(chunk_duration)
+
+        elif level < len(self.split_levels):
             if self.verbose == 2:
-                print("1st level chunk processing...")
-            first_level_chunks, first_level_chunks_durations = self._get_chunks_for_given_audio(
-                self.audio,
-                min_silence_len=1500,
-                silence_thresh=-20)
-
-            # 2 level chunks
-            for first_level_chunk, first_level_chunk_duration in zip(first_level_chunks, first_level_chunks_durations):
-                if first_level_chunk.duration_seconds > self.max_chunk_duration:
-                    if self.verbose == 2:
-                        print("2nd level chunk processing...")
-                    second_level_chunks, second_level_chunks_durations = self._get_chunks_for_given_audio(
-                        first_level_chunk,
-                        min_silence_len=1100,
-                        silence_thresh=-20)
-
-                    # 3 level chunks
-                    for second_level_chunk, second_level_chunk_duration in zip(second_level_chunks,
-                                                                               second_level_chunks_durations):
-                        if second_level_chunk.duration_seconds > self.max_chunk_duration:
-                            if self.verbose == 2:
-                                print("3rd level chunk processing...")
-                            third_level_chunks, third_level_chunks_durations = self._get_chunks_for_given_audio(
-                                second_level_chunk,
-                                min_silence_len=800,
-                                silence_thresh=-20)
-
-                            # 4 level chunks
-                            for third_level_chunk, third_level_chunk_duration in zip(third_level_chunks,
-                                                                                     third_level_chunks_durations):
-                                if third_level_chunk.duration_seconds > self.max_chunk_duration:
-                                    if self.verbose == 2:
-                                        print("4th level chunk processing...")
-                                    fourth_level_chunks, fourth_level_chunks_durations = self._get_chunks_for_given_audio(
-                                        third_level_chunk,
-                                        min_silence_len=500,
-                                        silence_thresh=-16)
-
-                                    for fourth_level_chunk, fourth_level_chunk_duration in zip(fourth_level_chunks,
-                                                                                               fourth_level_chunks_durations):
-                                        if fourth_level_chunk.duration_seconds > self.max_chunk_duration:
-                                            raise NoSilenceFoundError
-
-                                        else:
-                                            self.chunks.append(fourth_level_chunk)
-                                            self.chunks_durations.append(fourth_level_chunk_duration)
-                                else:
-                                    self.chunks.append(third_level_chunk)
-                                    self.chunks_durations.append(third_level_chunk_duration)
-                        else:
-                            self.chunks.append(second_level_chunk)
-                            self.chunks_durations.append(second_level_chunk_duration)
-                else:
-                    self.chunks.append(first_level_chunk)
-                    self.chunks_durations.append(first_level_chunk_duration)
+                print(f"Level {level + 1} chunk processing...")
+            min_silence_len, silence_thresh = self.split_levels[level]
+            with self.instrumentation.span("silence_detection", level=level + 1,
+                                           chunk_duration=self._get_chunk_duration(chunk)):
+                sub_chunks, sub_chunks_durations = self._get_chunks_for_given_audio(*chunk,
+                                                                                    min_silence_len=min_silence_len,
+                                                                                    silence_thresh=silence_thresh)
+            for sub_chunk, sub_chunk_duration in zip(sub_chunks, sub_chunks_durations):
+                self._split_chunk(sub_chunk, sub_chunk_duration, level + 1)
+
+        elif self.force_split:
+            if self.verbose == 2:
+                print("Forced chunk splitting...")
+            while self._get_chunk_duration(chunk) > self.max_chunk_duration:
+                left_chunk, chunk = self._force_split(chunk)
+                self.instrumentation.counter("forced_splits")
+                self.chunks.append(left_chunk)
+                self.chunks_durations.append(round(self._get_chunk_duration(left_chunk), 2))
+            self.chunks.append(chunk)
+            self.chunks_durations.append(round(self._get_chunk_duration(chunk), 2))
+
         else:
-            self.chunks.append(self.audio)
-            self.chunks_durations.append(self.audio_duration)
+            raise NoSilenceFoundError
+
+    def merge_chunks(self, target_duration: float):
+        """
+        Слияние соседних коротких чанков, пока их суммарная продолжительность не превышает target_duration.
+        Чанки близкой к target_duration длины уменьшают padding при распознавании batch-ами.
+        Args:
+            target_duration (float): Желаемая продолжительность чанка в секундах (не больше max_chunk_duration).
+        """
+        target_duration = min(target_duration, self.max_chunk_duration)
+        merged_chunks = []
+        merged_chunks_durations = []
+        for chunk, chunk_duration in zip(self.chunks, self.chunks_durations):
+            if merged_chunks and self._get_chunk_duration((merged_chunks[-1][0], chunk[1])) <= target_duration:
+                merged_chunks[-1] = (merged_chunks[-1][0], chunk[1])
+                merged_chunks_durations[-1] = round(merged_chunks_durations[-1] + chunk_duration, 2)
+            else:
+                merged_chunks.append(chunk)
+                merged_chunks_durations.append(chunk_duration)
+
+        self.chunks = merged_chunks
+        self.chunks_durations = merged_chunks_durations
+
+    def get_chunks(self):
+        """
+        Функция разбивает исходное аудио на чанки, ограниченные по продолжительности.
+        Делается это по уровням из self.split_levels, где с каждым уровнем, условия на "тишину" ослабляются,
+        тем самым, чанки, которые на предыдущем уровне не смогли уложиться в ограничения по продолжительности,
+        начинают укладываться в них.
+
+        Если после последнего уровня чанк не укладывается в рамки продолжительности, то он принудительно
+        разбивается в точке с наименьшей энергией (или выбрасывается NoSilenceFoundError, если force_split=False).
+        Если задан merge_target_duration, то после разбиения соседние короткие чанки сливаются.
+        """
+        self._split_chunk((0, len(self.samples)), self.audio_duration)
+        if self.merge_target_duration is not None:
+            self.merge_chunks(self.merge_target_duration)
+        self.instrumentation.counter("chunks", len(self.chunks))
+
+    def get_chunks_arrays(self):
+        """
+        Представление чанков в виде numpy массивов float32 (без копирования, как view на self.samples).
+        """
+        self.chunks_arrays = [self.samples[start:end] for start, end in self.chunks]
+
+    def filter_speech(self):
+        """
+        Отбрасывание чанков без речи и обрезка тишины в начале и в конце чанков с помощью self.speech_filter.
+        """
+        num_chunks = len(self.chunks)
+        self.chunks, self.chunks_arrays = self.speech_filter.filter_chunks(self.chunks, self.chunks_arrays,
+                                                                           self.instrumentation)
+        self.chunks_durations = [round(self._get_chunk_duration(chunk), 2) for chunk in self.chunks]
+        if self.verbose == 2:
+            print(f"Speech filter: dropped {num_chunks - len(self.chunks)} of {num_chunks} chunks")
 
     def save_chunks(self):
         """
@@ -169,19 +260,25 @@ class Audio2Chunks:
                 os.remove(os.path.join(chunks_directory_path, file))
 
         chunk_name_template = "{}_{}.wav"
-        for i, chunk in enumerate(self.chunks):
+        for i, (start, end) in enumerate(self.chunks):
             chunk_path = os.path.join(chunks_directory_path, chunk_name_template.format(audio_name, i))
             self.paths2chunks.append(chunk_path)
-            chunk.export(chunk_path, format="wav")
+            write_wav(chunk_path, self.samples[start:end], frame_rate=self.frame_rate)
 
-    def split_and_save_chunks(self):
+    def split_chunks(self, save_chunks: bool = False):
         """
-        Разделение аудио на чанки и их сохранение.
+        Разделение аудио на чанки. Чанки остаются в памяти (self.chunks_arrays).
+        Args:
+            save_chunks (bool): True, если чанки нужно дополнительно сохранить на диск (например, для отладки).
         """
         split_audio_start_time = time.time()
         self.load_audio()
         self.get_chunks()
-        self.save_chunks()
+        self.get_chunks_arrays()
+        if self.speech_filter is not None:
+            self.filter_speech()
+        if save_chunks:
+            self.save_chunks()
         self.split_audio_duration = time.time() - split_audio_start_time
 
         if self.verbose == 2:
@@ -189,3 +286,9 @@ class Audio2Chunks:
             print(f"Number of chunks = {len(self.chunks)}")
             for i, chunk_duration in enumerate(self.chunks_durations):
                 print(f"\tduration of chunk {i} = {chunk_duration}")
+
+    def split_and_save_chunks(self):
+        """
+        Разделение аудио на чанки и их сохранение.
+        """
+        self.split_chunks(save_chunks=True)
@@ -0,0 +1,183 @@
+"""
+Модуль содержит потоковое (блоками) декодирование аудио и разбиение его на чанки с ограниченным потреблением памяти.
+В отличие от Audio2Chunks, аудио целиком в память не загружается: 16K WAV читается блоками из memory map,
+остальные форматы ffmpeg декодирует и передискретизирует в 16K mono PCM, а готовые чанки отдаются генератором
+по мере поступления данных.
+"""
+import math
+import time
+from typing import Iterable, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .ingest import DecodedAudioCache, iter_pcm_blocks
+from .metrics import Instrumentation
+from .silence import MAX_POSSIBLE_AMPLITUDE, SilenceDetector, ms_to_frame, ratio_to_db
+from .split_audio import DEFAULT_SPLIT_LEVELS, Audio2Chunks
+from .vad import SpeechFilter
+
+
+class StreamingAudio2Chunks(Audio2Chunks):
+    """
+    Класс позволяет разбивать аудио на чанки потоково. В памяти хранится только буфер длиной порядка
+    lookahead_duration секунд, поэтому пиковое потребление памяти не зависит от длительности аудио.
+
+    Громкость, относительно которой задаются пороги тишины, считается по уже прочитанной части аудио,
+    поэтому границы чанков могут немного отличаться от границ, полученных в Audio2Chunks.
+    """
+
+    def __init__(self,
+                 path2audio: Optional[str] = None,
+                 pcm_blocks: Optional[Iterable[np.ndarray]] = None,
+                 max_chunk_duration: int = 150,
+                 verbose: int = 0,
+                 split_levels: Sequence[Tuple[int, int]] = DEFAULT_SPLIT_LEVELS,
+                 merge_target_duration: Optional[float] = None,
+                 lookahead_duration: Optional[float] = None,
+                 block_duration: float = 30.0,
+                 pause_split: Optional[Tuple[int, int]] = None,
+                 speech_filter: Optional[SpeechFilter] = None,
+                 audio_cache: Optional[DecodedAudioCache] = None,
+                 instrumentation: Optional[Instrumentation] = None):
+        """
+        Инициализация класса.
+        Args:
+            path2audio (str): Путь до аудио, которое нужно разбить на чанки.
+            pcm_blocks (Iterable[np.ndarray]): Блоки 16K mono float32 PCM (используются вместо path2audio).
+            max_chunk_duration (int): Максимальная длительность чанка в секундах.
+            verbose (int): Уровень подробности. Если =2, то выводить промежуточные данные.
+            split_levels (Sequence[Tuple[int, int]]): Уровни разбиения (см. Audio2Chunks).
+            merge_target_duration (float): Если задано, то соседние короткие чанки сливаются до этой длительности.
+            lookahead_duration (float): Длительность буфера (в секундах), по достижении которой буфер разбивается
+                                        на чанки. Должна быть больше max_chunk_duration (по умолчанию - 2x).
+            block_duration (float): Длительность блока декодирования в секундах.
+            pause_split (Tuple[int, int]): Параметры паузы (min_silence_len в мс, silence_thresh в dB относительно
+                                           громкости аудио), по которой чанк отрезается, не дожидаясь заполнения
+                                           буфера (для распознавания в реальном времени). None - не отрезать.
+            speech_filter (SpeechFilter): Если задан, то чанки без речи не отдаются, а тишина в начале и в конце
+                                          чанков обрезается.
+            audio_cache (DecodedAudioCache): Кэш декодированных аудио (если аудио уже есть в кэше, то оно читается
+                                             из кэша, а не декодируется ffmpeg).
+            instrumentation (Instrumentation): Сборщик метрик.
+        """
+        super().__init__(path2audio=path2audio,
+                         max_chunk_duration=max_chunk_duration,
+                         verbose=verbose,
+                         split_levels=split_levels,
+                         force_split=True,
+                         merge_target_duration=merge_target_duration,
+                         speech_filter=speech_filter,
+                         audio_cache=audio_cache,
+                         instrumentation=instrumentation)
+        if pcm_blocks is None:
+            pcm_blocks = iter_pcm_blocks(path2audio, frame_rate=self.frame_rate, block_duration=block_duration,
+                                         cache=audio_cache)
+        self.pcm_blocks = pcm_blocks
+        self.lookahead_duration = lookahead_duration if lookahead_duration is not None else 2 * max_chunk_duration
+        self.pause_split = pause_split
+        self.samples = np.zeros(0, dtype=np.float32)
+        # Один детектор тишины на весь поток: энергия досчитывается только для новых блоков
+        self.silence_detector = SilenceDetector(self.samples, frame_rate=self.frame_rate)
+        self.offset = 0  # номер сэмпла (от начала аудио), с которого начинается буфер self.samples
+        self.num_frames = 0
+        self.num_chunks = 0
+        self.total_energy = 0
+
+    def _update_reference_dbfs(self, block: np.ndarray):
+        """
+        Обновление громкости (dBFS) прочитанной части аудио.
+        """
+        self.num_frames += len(block)
+        self.total_energy += int(SilenceDetector._squares(block).sum())
+        rms = int(math.sqrt(self.total_energy / self.num_frames)) if self.num_frames else 0
+        self.reference_dbfs = ratio_to_db(rms / MAX_POSSIBLE_AMPLITUDE)
+
+    def _split_buffer(self, final: bool) -> Iterator[Tuple[Tuple[int, int], np.ndarray]]:
+        """
+        Разбиение буфера на чанки. Если final=False, то последний чанк остается в буфере, так как
+        он может продолжиться в следующих блоках.
+        """
+        self.chunks = []
+        self.chunks_durations = []
+        self._split_chunk((0, len(self.samples)), round(len(self.samples) / self.frame_rate, 2))
+        if not final and len(self.chunks) == 1 and self.pause_split is not None:
+            self._split_on_pause()
+
+        remainder_start = len(self.samples)
+        if not final and len(self.chunks) > 1:
+            remainder_start = self.chunks[-1][0]
+            self.chunks.pop()
+            self.chunks_durations.pop()
+        elif not final:
+            return
+        if self.merge_target_duration is not None:
+            self.merge_chunks(self.merge_target_duration)
+        self.instrumentation.counter("chunks", len(self.chunks))
+        self.chunks_arrays = [self.samples[start:end] for start, end in self.chunks]
+        if self.speech_filter is not None:
+            self.filter_speech()
+
+        for (start, end), chunk_array, chunk_duration in zip(self.chunks, self.chunks_arrays, self.chunks_durations):
+            if self.verbose == 2:
+                print(f"\tduration of chunk {self.num_chunks} = {chunk_duration}")
+            self.num_chunks += 1
+            yield (self.offset + start, self.offset + end), chunk_array
+
+        self.offset += remainder_start
+        self.silence_detector.discard(remainder_start)
+        self.samples = self.silence_detector.samples
+
+    def _split_on_pause(self):
+        """
+        Разбиение буфера, не превышающего max_chunk_duration, по последней паузе после речи
+        (пауза в начале буфера не учитывается, чтобы не отдавать чанки из одной тишины).
+        """
+        min_silence_len, silence_thresh = self.pause_split
+        with self.instrumentation.span("silence_detection", level=0,
+                                       chunk_duration=len(self.samples) / self.frame_rate):
+            silence_sectors = self.silence_detector.detect_silence(start=0,
+                                                                   end=len(self.samples),
+                                                                   min_silence_len=min_silence_len,
+                                                                   silence_thresh=self.reference_dbfs + silence_thresh)
+        silence_sectors = [sector for sector in silence_sectors if sector[0] > 0]
+        if not silence_sectors:
+            return
+        silence_start, silence_stop = silence_sectors[-1]
+        split_point = ms_to_frame((silence_start + silence_stop) / 2, len(self.samples), self.frame_rate)
+        self.chunks = [(0, split_point), (split_point, len(self.samples))]
+        self.chunks_durations = [round(self._get_chunk_duration(chunk), 2) for chunk in self.chunks]
+
+    def iter_chunks(self) -> Iterator[Tuple[Tuple[int, int], np.ndarray]]:
+        """
+        Потоковое разбиение аудио на чанки.
+        Returns:
+            Генератор пар (чанк (start, end) в сэмплах от начала аудио, чанк в виде массива float32).
+        """
+        split_audio_start_time = time.time()
+        self.num_chunks = 0
+        lookahead_frames = int(self.lookahead_duration * self.frame_rate)
+
+        pcm_blocks = iter(self.pcm_blocks)
+        while True:
+            with self.instrumentation.span("decode") as span:
+                block = next(pcm_blocks, None)
+                span["block_duration"] = len(block) / self.frame_rate if block is not None else 0
+            if block is None:
+                break
+            self._update_reference_dbfs(block)
+            self.silence_detector.append(block)
+            self.samples = self.silence_detector.samples
+            if len(self.samples) >= lookahead_frames:
+                for chunk in self._split_buffer(final=False):
+                    self.split_audio_duration = time.time() - split_audio_start_time
+                    yield chunk
+                    split_audio_start_time = time.time() - self.split_audio_duration
+
+        if len(self.samples) != 0:
+            for chunk in self._split_buffer(final=True):
+                self.split_audio_duration = time.time() - split_audio_start_time
+                yield chunk
+                split_audio_start_time = time.time() - self.split_audio_duration
+
+        self.audio_duration = self.num_frames / self.frame_rate
+        self.split_audio_duration = time.time() - split_audio_start_time
@@ -0,0 +1,190 @@
+"""
+Модуль содержит текст с временными метками: границы чанков (сегментов) и времена слов из выравнивания
+RNNT модели. Метки хранятся в массивах numpy, а тексты - одной строкой со смещениями, поэтому даже
+многочасовые транскрипции занимают мало памяти. Поддерживается экспорт в SRT, WebVTT и JSON.
+"""
+import json
+import re
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .utils import correct_cur_sent
+
+
+def _pack_strings(strings: Sequence[str]) -> Tuple[str, np.ndarray]:
+    """
+    Упаковка строк в одну строку и массив смещений (строка i - text[offsets[i]:offsets[i + 1]]).
+    """
+    offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(string) for string in strings])
+    return "".join(strings), offsets
+
+
+def _format_time(seconds: float, decimal_separator: str) -> str:
+    """
+    Время в формате HH:MM:SS,mmm (SRT) или HH:MM:SS.mmm (WebVTT).
+    """
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{decimal_separator}{milliseconds:03d}"
+
+
+class TimestampedTranscript:
+    """
+    Текст с временными метками.
+    Сегмент соответствует чанку с речью: его текст - исправленное предложение (стыки согласованы так же,
+    как в итоговом тексте), времена - границы чанка. Слова - слова "сырой" транскрипции с временами
+    из выравнивания RNNT (для чанков, для которых выравнивание недоступно, слов нет).
+    Времена хранятся в секундах от начала аудио (float32, точность - единицы миллисекунд для аудио до ~9 часов).
+    """
+
+    def __init__(self,
+                 segments_times: np.ndarray,
+                 segments_texts: Sequence[str],
+                 words_times: np.ndarray,
+                 words_segments: np.ndarray,
+                 words: Sequence[str]):
+        """
+        Args:
+            segments_times (np.ndarray): Границы сегментов, массив (N, 2) [start, end] в секундах.
+            segments_texts (Sequence[str]): Тексты сегментов.
+            words_times (np.ndarray): Времена слов, массив (M, 2) [start, end] в секундах.
+            words_segments (np.ndarray): Номер сегмента для каждого слова, массив (M,).
+            words (Sequence[str]): Слова.
+        """
+        self.segments_times = np.asarray(segments_times, dtype=np.float32).reshape(-1, 2)
+        self._segments_text, self._segments_offsets = _pack_strings(segments_texts)
+        self.words_times = np.asarray(words_times, dtype=np.float32).reshape(-1, 2)
+        self.words_segments = np.asarray(words_segments, dtype=np.int32)
+        self._words_text, self._words_offsets = _pack_strings(words)
+
+    @classmethod
+    def from_chunks(cls,
+                    chunks_alignment: Sequence[Tuple[Tuple[float, float], str, Optional[np.ndarray]]],
+                    sentences: Sequence[str]) -> "TimestampedTranscript":
+        """
+        Сборка из результатов этапов для чанков с речью.
+        Args:
+            chunks_alignment: Для каждого чанка с речью - границы чанка (start, end) в секундах от начала аудио,
+                              "сырая" транскрипция и времена ее слов относительно начала чанка, массив (K, 2)
+                              (None, если выравнивание недоступно).
+            sentences: Исправленные предложения чанков.
+        """
+        segments_texts = []
+        for idx, sentence in enumerate(sentences):
+            segments_texts.append(correct_cur_sent(sentences[idx - 1], sentence)
+                                  if idx > 0 and sentences[idx - 1] and sentence else sentence)
+
+        words = []
+        words_times = []
+        words_segments = []
+        for idx, ((chunk_start, _), raw_text, words_timestamps) in enumerate(chunks_alignment):
+            if words_timestamps is None:
+                continue
+            words.extend(raw_text.split())
+            words_times.append(np.asarray(words_timestamps, dtype=np.float64) + chunk_start)
+            words_segments.append(np.full(len(words_timestamps), idx, dtype=np.int32))
+
+        segments_times = [chunk_times for chunk_times, _, _ in chunks_alignment]
+        return cls(segments_times=np.asarray(segments_times, dtype=np.float32),
+                   segments_texts=segments_texts,
+                   words_times=np.concatenate(words_times) if words_times else np.zeros((0, 2)),
+                   words_segments=np.concatenate(words_segments) if words_segments else np.zeros(0),
+                   words=words)
+
+    def __len__(self) -> int:
+        return len(self.segments_times)
+
+    @property
+    def num_words(self) -> int:
+        return len(self.words_times)
+
+    def get_segment_text(self, idx: int) -> str:
+        return self._segments_text[self._segments_offsets[idx]: self._segments_offsets[idx + 1]]
+
+    def get_word(self, idx: int) -> str:
+        return self._words_text[self._words_offsets[idx]: self._words_offsets[idx + 1]]
+
+    def iter_segments(self) -> Iterator[Tuple[float, float, str]]:
+        """
+        Генератор сегментов (start, end, text).
+        """
+        for idx, (start, end) in enumerate(self.segments_times.tolist()):
+            yield start, end, self.get_segment_text(idx)
+
+    def iter_words(self) -> Iterator[Tuple[float, float, str]]:
+        """
+        Генератор слов (start, end, word).
+        """
+        for idx, (start, end) in enumerate(self.words_times.tolist()):
+            yield start, end, self.get_word(idx)
+
+    @property
+    def text(self) -> str:
+        return " ".join(text for _, _, text in self.iter_segments())
+
+    def find(self, query: str) -> np.ndarray:
+        """
+        Поиск фразы по словам "сырой" транскрипции (без учета регистра и пунктуации).
+        Args:
+            query (str): Слово или фраза.
+        Returns: Массив (K, 2) [start, end] в секундах для всех вхождений фразы.
+        """
+        query_words = re.findall(r"\w+", query.lower())
+        if not query_words:
+            return np.zeros((0, 2), dtype=np.float32)
+        words = [self.get_word(idx).lower() for idx in range(self.num_words)]
+        matches = [idx for idx in range(len(words) - len(query_words) + 1)
+                   if words[idx: idx + len(query_words)] == query_words
+                   and self.words_segments[idx] == self.words_segments[idx + len(query_words) - 1]]
+        if not matches:
+            return np.zeros((0, 2), dtype=np.float32)
+        matches = np.asarray(matches)
+        return np.stack((self.words_times[matches, 0], self.words_times[matches + len(query_words) - 1, 1]), axis=1)
+
+    def to_srt(self) -> str:
+        """
+        Экспорт сегментов в формат SRT.
+        """
+        blocks = [f"{idx}\n{_format_time(start, ',')} --> {_format_time(end, ',')}\n{text}\n"
+                  for idx, (start, end, text) in enumerate(self.iter_segments(), start=1)]
+        return "\n".join(blocks)
+
+    def to_vtt(self) -> str:
+        """
+        Экспорт сегментов в формат WebVTT.
+        """
+        blocks = ["WEBVTT\n"]
+        blocks += [f"{_format_time(start, '.')} --> {_format_time(end, '.')}\n{text}\n"
+                   for start, end, text in self.iter_segments()]
+        return "\n".join(blocks)
+
+    def to_dict(self) -> Dict[str, List]:
+        """
+        Представление в виде словаря (для JSON): сегменты со словами.
+        """
+        segments = [{"start": round(start, 3), "end": round(end, 3), "text": text, "words": []}
+                    for start, end, text in self.iter_segments()]
+        for (start, end, word), segment_idx in zip(self.iter_words(), self.words_segments.tolist()):
+            segments[segment_idx]["words"].append({"start": round(start, 3), "end": round(end, 3), "word": word})
+        return {"segments": segments}
+
+    def to_json(self, **kwargs) -> str:
+        """
+        Экспорт в JSON (параметры передаются в json.dumps).
+        """
+        return json.dumps(self.to_dict(), ensure_ascii=False, **kwargs)
+
+    def save(self, path: str):
+        """
+        Сохранение в файл, формат определяется расширением (.srt, .vtt или .json).
+        """
+        exporters = {".srt": self.to_srt, ".vtt": self.to_vtt, ".json": self.to_json}
+        extension = path[path.rfind("."):].lower()
+        if extension not in exporters:
+            raise ValueError(f"Unsupported timestamps format: {extension}. Expected one of {list(exporters)}")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(exporters[extension]())
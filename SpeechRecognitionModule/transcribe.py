@@ -1,12 +1,596 @@
 """
-Модуль содержит функцию осуществляющую перевод аудио в текст.
+Модуль содержит класс и функцию, осуществляющие перевод аудио в текст.
 """
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
 import torch
 
-from .split_audio import Audio2Chunks
-from .raw_transcription import RawTranscriptionModel
-from .spelling_correction import SpellingCorrector
-from .utils import print_stats
+from .split_audio import DEFAULT_SPLIT_LEVELS, Audio2Chunks
+from .backends import prepare_asr_model, prepare_spelling_model, set_num_threads, validate_backends, word_error_rate
+from .batching import DynamicBatcher
+from .cache import TranscriptionCache
+from .ingest import DecodedAudioCache
+from .metrics import Instrumentation, MetricsSink
+from .pipeline import PipelinedExecutor
+from .exceptions import BackendParityError
+from .raw_transcription import ASR_MODEL_NAME, RawTranscriptionModel
+from .realtime import RealtimeTranscription, TranscriptSegment
+from .spelling_correction import SPELLING_CORRECTION_MODEL, CorrectionGate, SpellingCorrector
+from .streaming import StreamingAudio2Chunks
+from .timestamps import TimestampedTranscript
+from .vad import SpeechFilter
+from .utils import concatenate_sentences, print_stats
+
+
+@dataclass
+class TranscriptionResult:
+    """
+    Результат перевода аудио в текст вместе с метриками обработки.
+    Attributes:
+        text (str): Текст извлеченный из аудио (str(result) возвращает его же).
+        audio_duration (float): Длительность аудио в секундах.
+        split_audio_duration (float): Время разбиения аудио на чанки.
+        transcription_duration (float): Время первичного распознавания.
+        spelling_correction_duration (float): Время правки текста.
+        processing_duration (float): Общее время обработки.
+        stages (Dict[str, float]): Суммарная продолжительность интервалов по названиям
+                                   ("decode", "silence_detection", "asr_batch", "t5_batch", ...).
+        counters (Dict[str, float]): Счетчики ("chunks", "forced_splits", "cache_hits{stage=asr}", ...).
+        spans (List[Dict]): Все интервалы с атрибутами (размер batch-а, доля padding-а, токены в секунду и т.д.).
+        timestamps (TimestampedTranscript): Текст с временными метками сегментов и слов (если Transcriber
+                                            создан с timestamps=True).
+    """
+    text: str
+    audio_duration: Optional[float] = None
+    split_audio_duration: Optional[float] = None
+    transcription_duration: Optional[float] = None
+    spelling_correction_duration: Optional[float] = None
+    processing_duration: Optional[float] = None
+    stages: Dict[str, float] = field(default_factory=dict)
+    counters: Dict[str, float] = field(default_factory=dict)
+    spans: List[Dict] = field(default_factory=list)
+    timestamps: Optional[TimestampedTranscript] = None
+
+    def __str__(self) -> str:
+        return self.text
+
+
+class Transcriber:
+    """
+    Класс для перевода аудио в текст. Модели Nemo и T5 загружаются один раз при инициализации
+    и переиспользуются для всех последующих аудио.
+    """
+
+    def __init__(self,
+                 device: torch.device,
+                 batch_size: int = 16,
+                 verbose: int = 1,
+                 max_seq_len: int = 256,
+                 max_chunk_duration: int = 150,
+                 spelling_batch_size: int = 8,
+                 spelling_max_batch_tokens: Optional[int] = 4096,
+                 correction_gate: Optional[CorrectionGate] = None,
+                 spelling_num_beams: int = 1,
+                 spelling_beam_max_tokens: Optional[int] = None,
+                 spelling_max_new_tokens_ratio: Optional[float] = None,
+                 save_chunks: bool = False,
+                 split_levels: Sequence[Tuple[int, int]] = DEFAULT_SPLIT_LEVELS,
+                 merge_target_duration: Optional[float] = None,
+                 speech_filter: Optional[SpeechFilter] = None,
+                 streaming: bool = False,
+                 pipelined: bool = False,
+                 pipeline_options: Optional[Dict[str, int]] = None,
+                 cache_dir: Optional[str] = None,
+                 cache_max_size_bytes: int = 1 << 30,
+                 decoded_audio_cache_dir: Optional[str] = None,
+                 metrics_sinks: Optional[List[MetricsSink]] = None,
+                 max_wait_ms: float = 10.0,
+                 timestamps: bool = False,
+                 asr_backend: str = "eager",
+                 spelling_backend: str = "eager",
+                 num_threads: Optional[int] = None,
+                 backend_artifacts_dir: Optional[str] = None,
+                 asr_model=None,
+                 tokenizer=None,
+                 spelling_model=None):
+        """
+        Инициализация моделей для распознавания речи и правки текста.
+        Args:
+            device (torch.device): CPU или GPU.
+            batch_size (int): Размер batch-а.
+            verbose (int): Уровень подробности.
+                           Если =0, то только возвращение output-а.
+                           Если =1, то предыдущее, а также вывод статистики по времени работы.
+                           Если =2, то предыдущее, а также вывод промежуточных результатов после каждого подэтапа.
+            max_seq_len (int): Максимальная длина входной последовательности для токенизатора.
+            max_chunk_duration (int): Максимальная продолжительность чанка в секундах.
+            spelling_batch_size (int): Максимальный размер batch-а для правки текста.
+            spelling_max_batch_tokens (int): Максимальное число токенов (с учетом padding-а) в batch-е
+                                             для правки текста.
+            correction_gate (CorrectionGate): Если задан, то T5 правит только отобранные им предложения (например,
+                                              со словами не из словаря), остальные получают легкую правку без модели.
+            spelling_num_beams (int): Число лучей beam search для T5 (1 - greedy).
+            spelling_beam_max_tokens (int): Beam search только для batch-ей не длиннее этого числа токенов.
+            spelling_max_new_tokens_ratio (float): Ограничение длины генерации T5 относительно длины входа
+                                                   (см. SpellingCorrector).
+            save_chunks (bool): True, если чанки нужно сохранять на диск (для отладки), иначе они остаются в памяти.
+            split_levels (Sequence[Tuple[int, int]]): Уровни разбиения аудио на чанки (см. Audio2Chunks).
+            merge_target_duration (float): Если задано, то соседние короткие чанки сливаются до этой длительности.
+            speech_filter (SpeechFilter): Фильтр речи: чанки без речи (тишина, шум, музыка) не распознаются,
+                                          а тишина в начале и в конце чанков обрезается. None - без фильтра.
+            streaming (bool): True, если аудио нужно декодировать и разбивать на чанки потоково (с ограниченным
+                              потреблением памяти, для очень длинных аудио). Чанки при этом на диск не сохраняются.
+            pipelined (bool): True, если этапы нужно выполнять одновременно (см. PipelinedExecutor).
+            pipeline_options (Dict[str, int]): Параметры этапов конвейера (chunks_queue_size, transcripts_queue_size,
+                                               asr_batch_size, spelling_batch_size, spelling_workers),
+                                               передаются в PipelinedExecutor.
+            cache_dir (str): Директория дискового кэша транскрипций и исправленных предложений. None - без кэша.
+            cache_max_size_bytes (int): Максимальный размер кэша в байтах.
+            decoded_audio_cache_dir (str): Директория кэша декодированных (16K mono) аудио для форматов, которые
+                                           нельзя прочитать напрямую (не 16K WAV). None - без кэша.
+            metrics_sinks (List[MetricsSink]): Приемники метрик обработки (LoggingSink, JsonTraceSink,
+                                               PrometheusTextSink). Метрики также возвращаются в TranscriptionResult.
+            max_wait_ms (float): Максимальное время ожидания заполнения общего batch-а в transcribe_async
+                                 (в миллисекундах).
+            timestamps (bool): True, если нужны временные метки сегментов (чанков) и слов
+                               (TranscriptionResult.timestamps).
+            asr_backend (str): Бэкенд инференса Nemo на CPU: "eager", "int8", "torchscript" или "onnx"
+                               (см. backends.py). Не "eager" бэкенды допустимы только при device CPU.
+            spelling_backend (str): Бэкенд инференса T5 на CPU: "eager", "int8" или "onnx".
+            num_threads (int): Число потоков для вычислений на CPU. None - все ядра.
+            backend_artifacts_dir (str): Директория для экспортированных (TorchScript/ONNX) моделей.
+            asr_model (EncDecRNNTBPEModel): Уже загруженная модель Nemo (или совместимая замена, например,
+                                            в бенчмарках). Если None, то загружается RawTranscriptionModel.load_model.
+            tokenizer (T5TokenizerFast): Уже загруженный токенизатор для правки текста.
+            spelling_model (PreTrainedModel): Уже загруженная модель для правки текста. Если tokenizer или
+                                              spelling_model не заданы, то загружается SpellingCorrector.load_model.
+        """
+        self.device = device
+        self.batch_size = batch_size
+        self.verbose = verbose
+        self.max_seq_len = max_seq_len
+        self.max_chunk_duration = max_chunk_duration
+        self.spelling_batch_size = spelling_batch_size
+        self.spelling_max_batch_tokens = spelling_max_batch_tokens
+        self.correction_gate = correction_gate
+        self.spelling_num_beams = spelling_num_beams
+        self.spelling_beam_max_tokens = spelling_beam_max_tokens
+        self.spelling_max_new_tokens_ratio = spelling_max_new_tokens_ratio
+        self.save_chunks = save_chunks
+        self.split_levels = split_levels
+        self.merge_target_duration = merge_target_duration
+        self.speech_filter = speech_filter
+        self.streaming = streaming
+        self.pipelined = pipelined
+        self.pipeline_options = pipeline_options if pipeline_options is not None else {}
+        self.cache = TranscriptionCache(cache_dir, cache_max_size_bytes) if cache_dir is not None else None
+        self.audio_cache = DecodedAudioCache(decoded_audio_cache_dir) if decoded_audio_cache_dir is not None else None
+        self.metrics_sinks = metrics_sinks if metrics_sinks is not None else []
+        self.instrumentation = Instrumentation(self.metrics_sinks)
+        self.max_wait_ms = max_wait_ms
+        self.timestamps = timestamps
+        self.asr_backend = asr_backend
+        self.spelling_backend = spelling_backend
+        self.num_threads = num_threads
+        self._asr_batcher: Optional[DynamicBatcher] = None
+        self._spelling_batcher: Optional[DynamicBatcher] = None
+
+        validate_backends(device, asr_backend, spelling_backend)
+        self.asr_model = asr_model if asr_model is not None else RawTranscriptionModel.load_model(device)
+        if spelling_backend == "onnx" and spelling_model is None:
+            # Модель T5 загружается из экспортированного ONNX в prepare_spelling_model
+            tokenizer = tokenizer if tokenizer is not None else SpellingCorrector.load_tokenizer()
+        elif tokenizer is None or spelling_model is None:
+            tokenizer, spelling_model = SpellingCorrector.load_model(device)
+        self.tokenizer = tokenizer
+        self.spelling_model = spelling_model
+
+        set_num_threads(num_threads)
+        self.asr_model = prepare_asr_model(self.asr_model,
+                                           backend=asr_backend,
+                                           model_name=ASR_MODEL_NAME,
+                                           artifacts_dir=backend_artifacts_dir,
+                                           num_threads=num_threads)
+        self.spelling_model = prepare_spelling_model(self.spelling_model,
+                                                     backend=spelling_backend,
+                                                     model_name=SPELLING_CORRECTION_MODEL,
+                                                     artifacts_dir=backend_artifacts_dir,
+                                                     num_threads=num_threads)
+
+        # Статистика по последнему обработанному аудио
+        self.audio_duration = None
+        self.split_audio_duration = None
+        self.transcription_duration = None
+        self.spelling_correction_duration = None
+        self.timestamps_transcript: Optional[TimestampedTranscript] = None
+        self._chunks_alignment: List[Tuple[Tuple[float, float], str, Optional[np.ndarray]]] = []
+
+    def make_speller(self,
+                     raw_sentences: List[str],
+                     concat_sentences: bool = False,
+                     instrumentation: Optional[Instrumentation] = None,
+                     **kwargs) -> SpellingCorrector:
+        """
+        SpellingCorrector с загруженной моделью T5 и параметрами правки текста этого Transcriber-а.
+        Args:
+            raw_sentences (List[str]): Предложения для правки.
+            concat_sentences (bool): True, если исправленные предложения нужно сконкатенировать.
+            instrumentation (Instrumentation): Сборщик метрик.
+            **kwargs: Параметры SpellingCorrector, отличающиеся от параметров Transcriber-а (например, batch_size).
+        """
+        speller_kwargs = dict(device=self.device,
+                              max_input=self.max_seq_len,
+                              tokenizer=self.tokenizer,
+                              model=self.spelling_model,
+                              batch_size=self.spelling_batch_size,
+                              max_batch_tokens=self.spelling_max_batch_tokens,
+                              cache=self.cache,
+                              gate=self.correction_gate,
+                              num_beams=self.spelling_num_beams,
+                              beam_max_tokens=self.spelling_beam_max_tokens,
+                              max_new_tokens_ratio=self.spelling_max_new_tokens_ratio)
+        speller_kwargs.update(kwargs)
+        return SpellingCorrector(raw_sentences=raw_sentences,
+                                 concat_sentences=concat_sentences,
+                                 instrumentation=instrumentation,
+                                 **speller_kwargs)
+
+    def _collect_alignment(self, chunks: List[Tuple[int, int]], frame_rate: int, nemo_model: RawTranscriptionModel):
+        """
+        Сохранение границ чанков с речью (в секундах), их транскрипций и времен слов для временных меток.
+        """
+        for (start, end), text, words_timestamps in zip(chunks, nemo_model.chunks_transcriptions,
+                                                        nemo_model.chunks_words_timestamps):
+            if len(text) != 0:
+                self._chunks_alignment.append(((start / frame_rate, end / frame_rate), text, words_timestamps))
+
+    def _split_and_transcribe(self, path2audio: str) -> List[str]:
+        """
+        Разбиение аудио на чанки и их первичное распознавание.
+        Args:
+            path2audio (str): Путь до аудио.
+
+        Returns:
+            Непустые транскрипции чанков.
+        """
+        verbose = self.verbose
+
+        if verbose == 2: print("Starting splitting audio on chunks.")
+        audio_splitter = Audio2Chunks(path2audio=path2audio,
+                                      verbose=verbose,
+                                      max_chunk_duration=self.max_chunk_duration,
+                                      split_levels=self.split_levels,
+                                      merge_target_duration=self.merge_target_duration,
+                                      speech_filter=self.speech_filter,
+                                      audio_cache=self.audio_cache,
+                                      instrumentation=self.instrumentation)
+        audio_splitter.split_chunks(save_chunks=self.save_chunks)
+        if verbose == 2: print("Finished splitting audio on chunks.")
+
+        if verbose == 2: print("Started transcribing chunks splitting audio.")
+        nemo_model = RawTranscriptionModel(chunks_arrays=audio_splitter.chunks_arrays,
+                                           model=self.asr_model,
+                                           cache=self.cache,
+                                           instrumentation=self.instrumentation,
+                                           return_timestamps=self.timestamps)
+        nemo_model.raw_transcription(batch_size=self.batch_size)
+        if verbose == 2: print("Finished transcribing chunks splitting audio.")
+        if self.timestamps:
+            self._collect_alignment(audio_splitter.chunks, audio_splitter.frame_rate, nemo_model)
+
+        self.audio_duration = audio_splitter.audio_duration
+        self.split_audio_duration = audio_splitter.split_audio_duration
+        self.transcription_duration = nemo_model.transcription_duration
+        return nemo_model.raw_transcriptions
+
+    def _split_and_transcribe_streaming(self, path2audio: str) -> List[str]:
+        """
+        Потоковое разбиение аудио на чанки и их первичное распознавание группами по batch_size чанков.
+        Аудио целиком в памяти не хранится.
+        Args:
+            path2audio (str): Путь до аудио.
+
+        Returns:
+            Непустые транскрипции чанков.
+        """
+        if self.verbose == 2: print("Started streaming splitting and transcribing audio.")
+        audio_splitter = StreamingAudio2Chunks(path2audio=path2audio,
+                                               verbose=self.verbose,
+                                               max_chunk_duration=self.max_chunk_duration,
+                                               split_levels=self.split_levels,
+                                               merge_target_duration=self.merge_target_duration,
+                                               speech_filter=self.speech_filter,
+                                               audio_cache=self.audio_cache,
+                                               instrumentation=self.instrumentation)
+        raw_transcriptions = []
+        self.transcription_duration = 0
+        chunks = []
+        for chunk, chunk_array in audio_splitter.iter_chunks():
+            chunks.append((chunk, chunk_array))
+            if len(chunks) == self.batch_size:
+                raw_transcriptions.extend(self._transcribe_chunks_group(chunks, audio_splitter.frame_rate))
+                chunks = []
+        if chunks:
+            raw_transcriptions.extend(self._transcribe_chunks_group(chunks, audio_splitter.frame_rate))
+        if self.verbose == 2: print("Finished streaming splitting and transcribing audio.")
+
+        self.audio_duration = audio_splitter.audio_duration
+        self.split_audio_duration = audio_splitter.split_audio_duration
+        return raw_transcriptions
+
+    def _transcribe_chunks_group(self, chunks: List[Tuple[Tuple[int, int], np.ndarray]], frame_rate: int) -> List[str]:
+        """
+        Первичное распознавание группы чанков (время добавляется к self.transcription_duration).
+        Args:
+            chunks: Пары (чанк (start, end) в сэмплах от начала аудио, чанк в виде массива float32).
+            frame_rate: Частота дискретизации.
+        """
+        nemo_model = RawTranscriptionModel(chunks_arrays=[chunk_array for _, chunk_array in chunks],
+                                           model=self.asr_model,
+                                           cache=self.cache,
+                                           instrumentation=self.instrumentation,
+                                           return_timestamps=self.timestamps)
+        nemo_model.raw_transcription(batch_size=self.batch_size)
+        self.transcription_duration += nemo_model.transcription_duration
+        if self.timestamps:
+            self._collect_alignment([chunk for chunk, _ in chunks], frame_rate, nemo_model)
+        return nemo_model.raw_transcriptions
+
+    def transcribe(self, path2audio: str) -> TranscriptionResult:
+        """
+        Функция переводит аудио в текст. Метрики обработки передаются в metrics_sinks
+        и возвращаются вместе с текстом.
+        Args:
+            path2audio (str): Путь до аудио.
+
+        Returns:
+            Текст извлеченный из аудио и метрики обработки.
+        """
+        self.instrumentation = Instrumentation(self.metrics_sinks)
+        processing_start_time = time.time()
+        with self.instrumentation.span("transcribe", path=path2audio) as span:
+            output = self._transcribe(path2audio)
+            span["audio_duration"] = self.audio_duration
+        result = TranscriptionResult(text=output,
+                                     audio_duration=self.audio_duration,
+                                     split_audio_duration=self.split_audio_duration,
+                                     transcription_duration=self.transcription_duration,
+                                     spelling_correction_duration=self.spelling_correction_duration,
+                                     processing_duration=time.time() - processing_start_time,
+                                     stages=self.instrumentation.get_stage_durations(),
+                                     counters=dict(self.instrumentation.counters),
+                                     spans=list(self.instrumentation.spans),
+                                     timestamps=self.timestamps_transcript)
+        self.instrumentation.flush()
+        return result
+
+    def _transcribe(self, path2audio: str) -> str:
+        """
+        Перевод аудио в текст без сбора результата (метрики накапливаются в self.instrumentation).
+        """
+        verbose = self.verbose
+        self.timestamps_transcript = None
+        self._chunks_alignment = []
+
+        if self.pipelined:
+            executor = PipelinedExecutor(self, **self.pipeline_options)
+            output = executor.run(path2audio)
+            self.audio_duration = executor.audio_duration
+            self.split_audio_duration = executor.split_audio_duration
+            self.transcription_duration = executor.transcription_duration
+            self.spelling_correction_duration = executor.spelling_correction_duration
+            self.timestamps_transcript = executor.timestamps_transcript
+            return output
+
+        if self.streaming:
+            raw_transcriptions = self._split_and_transcribe_streaming(path2audio)
+        else:
+            raw_transcriptions = self._split_and_transcribe(path2audio)
+
+        if verbose == 2: print("Started correcting spelling and merging chunks.")
+        speller = self.make_speller(raw_transcriptions, concat_sentences=True, instrumentation=self.instrumentation)
+        output = speller.correct_spelling()
+        if verbose == 2: print("Finished correcting spelling and merging chunks.")
+
+        self.spelling_correction_duration = speller.spelling_correction_duration
+        if self.timestamps:
+            self.timestamps_transcript = TimestampedTranscript.from_chunks(self._chunks_alignment,
+                                                                           speller.spelling_corrected_sentences)
+
+        if verbose >= 1: print_stats(audio_duration=self.audio_duration,
+                                    time_for_splitting_audio=self.split_audio_duration,
+                                    time_for_transcribing=self.transcription_duration,
+                                    time_for_spelling_correction=self.spelling_correction_duration)
+
+        return output
+
+    def _transcribe_batch(self, chunks_arrays: List[np.ndarray]) -> List[Tuple[str, Optional[np.ndarray]]]:
+        """
+        Первичное распознавание общего batch-а чанков от нескольких запросов transcribe_async.
+        Returns: Транскрипции всех чанков (включая пустые) и времена их слов (если timestamps).
+        """
+        nemo_model = RawTranscriptionModel(chunks_arrays=chunks_arrays,
+                                           model=self.asr_model,
+                                           cache=self.cache,
+                                           instrumentation=Instrumentation(self.metrics_sinks),
+                                           return_timestamps=self.timestamps)
+        nemo_model.raw_transcription(batch_size=self.batch_size)
+        return list(zip(nemo_model.chunks_transcriptions, nemo_model.chunks_words_timestamps))
+
+    def _correct_batch(self, sentences: List[str]) -> List[str]:
+        """
+        Правка общего batch-а предложений от нескольких запросов transcribe_async.
+        """
+        speller = self.make_speller(sentences, instrumentation=Instrumentation(self.metrics_sinks))
+        return speller.correct_spelling()
+
+    def _get_batchers(self) -> Tuple[DynamicBatcher, DynamicBatcher]:
+        """
+        Batcher-ы для общих batch-ей Nemo и T5 (создаются при первом вызове transcribe_async).
+        """
+        if self._asr_batcher is None:
+            self._asr_batcher = DynamicBatcher(self._transcribe_batch,
+                                               max_batch_size=self.batch_size,
+                                               max_wait_ms=self.max_wait_ms,
+                                               name="asr-batcher")
+            self._spelling_batcher = DynamicBatcher(self._correct_batch,
+                                                    max_batch_size=self.spelling_batch_size,
+                                                    max_wait_ms=self.max_wait_ms,
+                                                    name="spelling-batcher")
+        return self._asr_batcher, self._spelling_batcher
+
+    async def transcribe_async(self, path2audio: str) -> TranscriptionResult:
+        """
+        Асинхронный перевод аудио в текст для сервисов, обрабатывающих много одновременных запросов.
+        Разбиение аудио выполняется в пуле потоков, а чанки и предложения всех одновременных запросов
+        собираются в общие batch-и Nemo и T5 (не более batch_size / spelling_batch_size элементов,
+        ожидание не более max_wait_ms). Event loop при этом не блокируется.
+        Args:
+            path2audio (str): Путь до аудио.
+
+        Returns:
+            Текст извлеченный из аудио и метрики обработки (общие batch-и передаются только в metrics_sinks).
+        """
+        loop = asyncio.get_running_loop()
+        asr_batcher, spelling_batcher = self._get_batchers()
+        instrumentation = Instrumentation(self.metrics_sinks)
+        processing_start_time = time.time()
+
+        with instrumentation.span("transcribe", path=path2audio) as span:
+            audio_splitter = Audio2Chunks(path2audio=path2audio,
+                                          verbose=0,
+                                          max_chunk_duration=self.max_chunk_duration,
+                                          split_levels=self.split_levels,
+                                          merge_target_duration=self.merge_target_duration,
+                                          speech_filter=self.speech_filter,
+                                          audio_cache=self.audio_cache,
+                                          instrumentation=instrumentation)
+            await loop.run_in_executor(None, audio_splitter.split_chunks, self.save_chunks)
+
+            transcription_start_time = time.time()
+            chunks_transcriptions = await asr_batcher.submit_many(audio_splitter.chunks_arrays)
+            transcription_duration = time.time() - transcription_start_time
+            chunks_alignment = [((start / audio_splitter.frame_rate, end / audio_splitter.frame_rate),
+                                 text, words_timestamps)
+                                for (start, end), (text, words_timestamps) in zip(audio_splitter.chunks,
+                                                                                 chunks_transcriptions)
+                                if len(text) != 0]
+
+            spelling_correction_start_time = time.time()
+            corrected_sentences = await spelling_batcher.submit_many([text for _, text, _ in chunks_alignment])
+            spelling_correction_duration = time.time() - spelling_correction_start_time
+            span["audio_duration"] = audio_splitter.audio_duration
+
+        result = TranscriptionResult(text=concatenate_sentences(corrected_sentences),
+                                     audio_duration=audio_splitter.audio_duration,
+                                     split_audio_duration=audio_splitter.split_audio_duration,
+                                     transcription_duration=transcription_duration,
+                                     spelling_correction_duration=spelling_correction_duration,
+                                     processing_duration=time.time() - processing_start_time,
+                                     stages=instrumentation.get_stage_durations(),
+                                     counters=dict(instrumentation.counters),
+                                     spans=list(instrumentation.spans),
+                                     timestamps=(TimestampedTranscript.from_chunks(chunks_alignment,
+                                                                                   corrected_sentences)
+                                                 if self.timestamps else None))
+        instrumentation.flush()
+        return result
+
+    async def aclose(self):
+        """
+        Остановка batcher-ов transcribe_async.
+        """
+        for batcher in (self._asr_batcher, self._spelling_batcher):
+            if batcher is not None:
+                await batcher.close()
+        self._asr_batcher = None
+        self._spelling_batcher = None
+
+    def transcribe_stream(self,
+                          pcm_blocks: Iterable[Union[bytes, np.ndarray]],
+                          max_chunk_duration: int = 10,
+                          correct_spelling: bool = True) -> Iterator[TranscriptSegment]:
+        """
+        Перевод в текст аудио, поступающего в реальном времени (например, из сокета или микрофона).
+        Args:
+            pcm_blocks: Блоки 16K mono PCM (bytes s16le или массивы numpy int16/float32) в порядке записи.
+            max_chunk_duration (int): Максимальная длительность чанка в секундах.
+            correct_spelling (bool): True, если после "сырого" сегмента нужно отдавать исправленный.
+
+        Returns:
+            Генератор сегментов TranscriptSegment: partial (is_final=False), затем исправленный (is_final=True).
+        """
+        realtime = RealtimeTranscription(self, max_chunk_duration=max_chunk_duration, correct_spelling=correct_spelling)
+        return realtime.run(pcm_blocks)
+
+    def check_backend_parity(self,
+                             paths2audio: List[str],
+                             reference: Optional["Transcriber"] = None,
+                             max_wer: float = 0.01) -> Dict[str, float]:
+        """
+        Проверка того, что результаты выбранных бэкендов совпадают с результатами eager PyTorch.
+        Args:
+            paths2audio (List[str]): Пути до аудио для проверки.
+            reference (Transcriber): Transcriber с eager моделями. Если None, то модели загружаются заново.
+            max_wer (float): Максимально допустимый WER относительно eager результатов.
+        Returns:
+            WER и доля полностью совпадающих текстов.
+        """
+        if reference is None:
+            reference = Transcriber(self.device,
+                                    batch_size=self.batch_size,
+                                    verbose=0,
+                                    max_seq_len=self.max_seq_len,
+                                    max_chunk_duration=self.max_chunk_duration,
+                                    spelling_batch_size=self.spelling_batch_size,
+                                    spelling_max_batch_tokens=self.spelling_max_batch_tokens,
+                                    correction_gate=self.correction_gate,
+                                    spelling_num_beams=self.spelling_num_beams,
+                                    spelling_beam_max_tokens=self.spelling_beam_max_tokens,
+                                    spelling_max_new_tokens_ratio=self.spelling_max_new_tokens_ratio,
+                                    split_levels=self.split_levels,
+                                    merge_target_duration=self.merge_target_duration,
+                                    speech_filter=self.speech_filter)
+        reference_texts = [result.text for result in reference.transcribe_many(paths2audio)]
+        texts = [result.text for result in self.transcribe_many(paths2audio)]
+
+        wer = word_error_rate(reference_texts, texts)
+        parity = {"wer": wer,
+                  "exact_match": sum(text == reference_text for text, reference_text in zip(texts, reference_texts))
+                  / max(len(texts), 1)}
+        if wer > max_wer:
+            raise BackendParityError(wer, max_wer)
+        return parity
+
+    def transcribe_many(self, paths2audio: List[str]) -> List[TranscriptionResult]:
+        """
+        Функция переводит несколько аудио в текст, переиспользуя загруженные модели.
+        Args:
+            paths2audio (List[str]): Пути до аудио.
+
+        Returns:
+            Тексты извлеченные из аудио и метрики обработки (в том же порядке).
+        """
+        return [self.transcribe(path2audio) for path2audio in paths2audio]
+
+
+_default_transcribers: Dict[str, Transcriber] = {}
+
+
+def get_default_transcriber(device: torch.device) -> Transcriber:
+    """
+    Возвращает закэшированный Transcriber для данного устройства (модели загружаются только при первом вызове).
+    Args:
+        device (torch.device): CPU или GPU.
+    """
+    key = str(device)
+    if key not in _default_transcribers:
+        _default_transcribers[key] = Transcriber(device=device)
+    return _default_transcribers[key]
 
 
 def speech2text(path2audio: str,
@@ -14,9 +598,12 @@ def speech2text(path2audio: str,
                 batch_size: int = 16,
                 verbose: int = 1,
                 max_seq_len: int = 256,
-                max_chunk_duration: int = 150) -> str:
+                max_chunk_duration: int = 150,
+                pipelined: bool = False,
+                pipeline_options: Optional[Dict[str, int]] = None) -> TranscriptionResult:
     """
-    Функция переводит аудио в текст.
+    Функция переводит аудио в текст. Использует закэшированный Transcriber, поэтому модели
+    загружаются только при первом вызове для данного устройства.
     Args:
         path2audio (str): Путь до аудио.
         device (torch.device): CPU или GPU.
@@ -27,31 +614,17 @@ def speech2text(path2audio: str,
                        Если =2, то предыдущее, а также вывод промежуточных результатов после каждого подэтапа.
         max_seq_len (int): Максимальная длина входной последовательности для токенизатора.
         max_chunk_duration (int): Максимальная продолжительность чанка в секундах.
+        pipelined (bool): True, если этапы нужно выполнять одновременно (см. PipelinedExecutor).
+        pipeline_options (Dict[str, int]): Параметры этапов конвейера (см. Transcriber).
 
     Returns:
-        Текст извлеченный из аудио.
-    """
-    if verbose == 2: print("Starting splitting audio on chunks.")
-    audio_splitter = Audio2Chunks(path2audio=path2audio, verbose=verbose, max_chunk_duration=max_chunk_duration)
-    audio_splitter.split_and_save_chunks()
-    if verbose == 2: print("Finished splitting audio on chunks.")
-
-    if verbose == 2: print("Started transcribing chunks splitting audio.")
-    nemo_model = RawTranscriptionModel(paths2chunks=audio_splitter.paths2chunks)
-    nemo_model.raw_transcription(batch_size=batch_size)
-    if verbose == 2: print("Finished transcribing chunks splitting audio.")
-
-    if verbose == 2: print("Started correcting spelling and merging chunks.")
-    speller = SpellingCorrector(raw_sentences=nemo_model.raw_transcriptions,
-                                device=device,
-                                concat_sentences=True,
-                                max_input=max_seq_len)
-    output = speller.correct_spelling()
-    if verbose == 2: print("Finished correcting spelling and merging chunks.")
-
-    if verbose >= 1: print_stats(audio_duration=audio_splitter.audio_duration,
-                                time_for_splitting_audio=audio_splitter.split_audio_duration,
-                                time_for_transcribing=nemo_model.transcription_duration,
-                                time_for_spelling_correction=speller.spelling_correction_duration)
-
-    return output
+        Текст извлеченный из аудио (result.text или str(result)) и метрики обработки по этапам.
+    """
+    transcriber = get_default_transcriber(device)
+    transcriber.batch_size = batch_size
+    transcriber.verbose = verbose
+    transcriber.max_seq_len = max_seq_len
+    transcriber.max_chunk_duration = max_chunk_duration
+    transcriber.pipelined = pipelined
+    transcriber.pipeline_options = pipeline_options if pipeline_options is not None else {}
+    return transcriber.transcribe(path2audio)
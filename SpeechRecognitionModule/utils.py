@@ -1,4 +1,9 @@
 """Модуль со вспомогательными функциями."""
+from typing import List, Optional
+
+# Слова, с которых начинаются вопросы (для легкой расстановки пунктуации без модели)
+QUESTION_WORDS = {"кто", "что", "где", "когда", "куда", "откуда", "почему", "зачем", "как", "какой", "какая",
+                  "какое", "какие", "сколько", "чей", "чья", "чье", "чьи", "разве", "неужели"}
 
 def is_cur_sentence_instance_of_prev(last_symbol_of_prev_sent) -> bool:
     """
@@ -18,6 +23,26 @@ def uncapitalize(sentence: str) -> str:
     return sentence
 
 
+def capitalize(sentence: str) -> str:
+    """
+    Функция приводит первый символ предложения к верхнему регистру.
+    """
+    return sentence[:1].upper() + sentence[1:]
+
+
+def light_punctuation(sentence: str) -> str:
+    """
+    Легкая правка "сырого" предложения без модели: заглавная первая буква и знак препинания в конце
+    (вопросительный, если предложение начинается с вопросительного слова).
+    """
+    sentence = sentence.strip()
+    if len(sentence) == 0:
+        return sentence
+    if sentence[-1] not in ['.', '?', '!']:
+        sentence += "?" if sentence.split(maxsplit=1)[0].lower() in QUESTION_WORDS else "."
+    return capitalize(sentence)
+
+
 def correct_cur_sent(prev_sent: str, cur_sent: str) -> str:
     """
     Функция применяет правки к текущему предложению в зависимости от предыдущего.
@@ -33,6 +58,23 @@ def correct_cur_sent(prev_sent: str, cur_sent: str) -> str:
     return cur_sent
 
 
+def concatenate_sentences(sentences: List[str]) -> str:
+    """
+    Конкатенация исправленных предложений с учетом пунктуации на их стыках. Пустые предложения пропускаются.
+    Args:
+        sentences: Исправленные предложения.
+    Returns: Единый текст.
+    """
+    sentences = [sentence for sentence in sentences if sentence]
+    if len(sentences) == 0:
+        return ""
+    parts = [sentences[0]]
+    for prev_sent, cur_sent in zip(sentences, sentences[1:]):
+        parts.append(correct_cur_sent(prev_sent, cur_sent))
+
+    return " ".join(parts)
+
+
 def pretty_time_delta(seconds):
     """
     Returns seconds in pretty format.
@@ -52,7 +94,8 @@ def pretty_time_delta(seconds):
     return result
 
 
-def print_stats(audio_duration, time_for_splitting_audio, time_for_transcribing, time_for_spelling_correction):
+def print_stats(audio_duration, time_for_splitting_audio, time_for_transcribing, time_for_spelling_correction,
+                overall_time: Optional[float] = None):
     """
     Вывод статистики по скорости выполнения.
     Args:
@@ -60,15 +103,19 @@ def print_stats(audio_duration, time_for_splitting_audio, time_for_transcribing,
         time_for_splitting_audio: Время для выполнения этапа разделения аудио на чанки (s).
         time_for_transcribing: Время для выполнения этапа транскрибирования чанков (s)
         time_for_spelling_correction: Время для выполнения этапа корректировки транскрибирования (s)
+        overall_time: Общее время обработки (s). Если None, то сумма времен этапов (этапы выполнялись
+                      последовательно), иначе этапы выполнялись параллельно.
     """
+    if overall_time is None:
+        overall_time = time_for_splitting_audio + time_for_transcribing + time_for_spelling_correction
     text = f"""---------------\nOverall stats:
     \tDuration of audio = {pretty_time_delta(audio_duration)}
     \tTime for splitting audio = {pretty_time_delta(time_for_splitting_audio)}
     \tTime for transcribing audio = {pretty_time_delta(time_for_transcribing)}
     \tTime for spelling audio = {pretty_time_delta(time_for_spelling_correction)}
     \t-----------------
-    \tOverall time for processing audio = {pretty_time_delta(time_for_splitting_audio + time_for_transcribing + time_for_spelling_correction)}
-    \tProcessing is {round(audio_duration / (time_for_splitting_audio + time_for_transcribing + time_for_spelling_correction), 2)} times faster than audio duration
+    \tOverall time for processing audio = {pretty_time_delta(overall_time)}
+    \tProcessing is {round(audio_duration / overall_time, 2)} times faster than audio duration
     """
     print(text)
 
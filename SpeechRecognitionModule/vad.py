@@ -0,0 +1,151 @@
+"""
+Модуль содержит дешевый (numpy) фильтр речи, который применяется к чанкам до распознавания: чанки без речи
+(тишина, шум, музыка на удержании) отбрасываются, а тишина в начале и в конце чанков обрезается, чтобы
+не тратить время модели Nemo на участки, из которых не получится текста.
+"""
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .metrics import Instrumentation
+
+
+class SpeechFilter:
+    """
+    Фильтр речи по энергии и частоте пересечений нуля (ZCR) в кадрах по frame_duration мс.
+    Кадр считается речью, если его громкость не меньше min_energy_db dBFS и превышает "фон" чанка
+    (noise_percentile процентиль громкостей кадров) на energy_margin_db, а ZCR не больше max_zcr (у шума ZCR ~0.5).
+    Требование превышения над фоном отсеивает ровные по громкости сигналы (гудки, шум, музыку без пауз),
+    у речи громкость заметно меняется от слога к слогу.
+    """
+
+    def __init__(self,
+                 frame_duration: int = 30,
+                 min_energy_db: float = -45.0,
+                 energy_margin_db: float = 10.0,
+                 noise_percentile: float = 10.0,
+                 max_zcr: float = 0.4,
+                 min_speech_duration: float = 0.3,
+                 padding: float = 0.3,
+                 trim: bool = True,
+                 frame_rate: int = 16000):
+        """
+        Args:
+            frame_duration (int): Длительность кадра в мс.
+            min_energy_db (float): Минимальная громкость кадра с речью в dBFS.
+            energy_margin_db (float): На сколько dB громкость кадра с речью должна превышать фон чанка.
+            noise_percentile (float): Процентиль громкостей кадров чанка, который считается фоном.
+            max_zcr (float): Максимальная доля пересечений нуля в кадре с речью.
+            min_speech_duration (float): Минимальная суммарная длительность кадров с речью (в секундах),
+                                         при которой чанк отдается на распознавание.
+            padding (float): Запас (в секундах), оставляемый до первого и после последнего кадра с речью при обрезке.
+            trim (bool): True, если тишину в начале и в конце чанков нужно обрезать, False - только отбрасывать чанки.
+            frame_rate (int): Частота дискретизации.
+        """
+        self.frame_duration = frame_duration
+        self.min_energy_db = min_energy_db
+        self.energy_margin_db = energy_margin_db
+        self.noise_percentile = noise_percentile
+        self.max_zcr = max_zcr
+        self.min_speech_duration = min_speech_duration
+        self.padding = padding
+        self.trim = trim
+        self.frame_rate = frame_rate
+        self.frame_size = frame_rate * frame_duration // 1000
+
+    def get_config(self) -> Dict[str, float]:
+        """
+        Пороги фильтра (передаются в атрибуты интервала "speech_filter").
+        """
+        return {"min_energy_db": self.min_energy_db,
+                "energy_margin_db": self.energy_margin_db,
+                "noise_percentile": self.noise_percentile,
+                "max_zcr": self.max_zcr,
+                "min_speech_duration": self.min_speech_duration,
+                "padding": self.padding}
+
+    def score_frames(self, samples: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Громкость (dBFS) и ZCR кадров сигнала (неполный последний кадр не учитывается).
+        Args:
+            samples (np.ndarray): Сигнал (mono, float32 в диапазоне [-1, 1]).
+        Returns: Массивы громкостей и ZCR кадров.
+        """
+        num_frames = len(samples) // self.frame_size
+        frames = samples[:num_frames * self.frame_size].reshape(num_frames, self.frame_size)
+        energy_db = 10 * np.log10(np.einsum("ij,ij->i", frames, frames) / self.frame_size + 1e-10)
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / self.frame_size
+        return energy_db, zcr
+
+    def get_speech_mask(self, samples: np.ndarray) -> np.ndarray:
+        """
+        Маска кадров с речью.
+        """
+        energy_db, zcr = self.score_frames(samples)
+        if len(energy_db) == 0:
+            return np.zeros(0, dtype=bool)
+        energy_thresh = max(self.min_energy_db, np.percentile(energy_db, self.noise_percentile) + self.energy_margin_db)
+        return (energy_db >= energy_thresh) & (zcr <= self.max_zcr)
+
+    def find_speech(self, samples: np.ndarray) -> Optional[Tuple[int, int]]:
+        """
+        Поиск участка с речью в чанке.
+        Args:
+            samples (np.ndarray): Чанк (mono, float32).
+        Returns: Границы участка с речью (start, end) в сэмплах относительно начала чанка (весь чанк, если trim=False)
+                 или None, если речи в чанке нет.
+        """
+        speech_frames = np.flatnonzero(self.get_speech_mask(samples))
+        if len(speech_frames) * self.frame_size < self.min_speech_duration * self.frame_rate:
+            return None
+        if not self.trim:
+            return 0, len(samples)
+        padding = int(self.padding * self.frame_rate)
+        return (max(0, int(speech_frames[0]) * self.frame_size - padding),
+                min(len(samples), (int(speech_frames[-1]) + 1) * self.frame_size + padding))
+
+    def filter_chunks(self,
+                      chunks: List[Tuple[int, int]],
+                      chunks_arrays: List[np.ndarray],
+                      instrumentation: Optional[Instrumentation] = None
+                      ) -> Tuple[List[Tuple[int, int]], List[np.ndarray]]:
+        """
+        Отбрасывание чанков без речи и обрезка тишины в начале и в конце остальных чанков.
+        Итоги (число отброшенных и обрезанных чанков, секунды аудио) пишутся в счетчики speech_filter_chunks
+        и speech_filter_seconds с меткой action.
+        Args:
+            chunks: Чанки (start, end) в сэмплах.
+            chunks_arrays: Чанки в виде массивов float32.
+            instrumentation (Instrumentation): Сборщик метрик.
+        Returns: Чанки с речью (границы и массивы без копирования, как view на исходные).
+        """
+        instrumentation = instrumentation if instrumentation is not None else Instrumentation()
+        filtered_chunks = []
+        filtered_chunks_arrays = []
+        stats = {"kept": 0, "trimmed": 0, "dropped": 0}
+        seconds = {"trimmed": 0.0, "dropped": 0.0}
+        with instrumentation.span("speech_filter", num_chunks=len(chunks), **self.get_config()) as span:
+            for (start, end), chunk_array in zip(chunks, chunks_arrays):
+                speech = self.find_speech(chunk_array)
+                if speech is None:
+                    stats["dropped"] += 1
+                    seconds["dropped"] += len(chunk_array) / self.frame_rate
+                    continue
+                speech_start, speech_end = speech
+                if speech_end - speech_start < len(chunk_array):
+                    stats["trimmed"] += 1
+                    seconds["trimmed"] += (len(chunk_array) - speech_end + speech_start) / self.frame_rate
+                else:
+                    stats["kept"] += 1
+                filtered_chunks.append((start + speech_start, start + speech_end))
+                filtered_chunks_arrays.append(chunk_array[speech_start:speech_end])
+            span.update({f"{action}_chunks": value for action, value in stats.items()})
+
+        for action, value in stats.items():
+            if value:
+                instrumentation.counter("speech_filter_chunks", value, action=action)
+        for action, value in seconds.items():
+            if value:
+                instrumentation.counter("speech_filter_seconds", round(value, 3), action=action)
+        return filtered_chunks, filtered_chunks_arrays
@@ -0,0 +1,185 @@
+"""
+Бенчмарк этапов SpeechRecognitionModule на синтетическом аудио (речеподобные участки, разделенные тишиной).
+По умолчанию используются легковесные замены моделей (stub_models.py), поэтому бенчмарк работает офлайн на CPU
+и измеряет накладные расходы самого модуля. Результат - JSON с пропускной способностью, пиковой памятью
+и временем каждого этапа, который можно сравнивать между коммитами.
+
+Пример запуска:
+    python benchmarks/run_benchmarks.py --durations 60 600 1800 10800 --output bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import wave
+from typing import Callable, Dict, List
+
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from SpeechRecognitionModule.backends import ASR_BACKENDS, SPELLING_BACKENDS  # noqa: E402
+from SpeechRecognitionModule.spelling_correction import SpellingCorrector  # noqa: E402
+from SpeechRecognitionModule.split_audio import Audio2Chunks  # noqa: E402
+from SpeechRecognitionModule.transcribe import Transcriber  # noqa: E402
+
+from stub_models import StubASRModel, StubSpellingModel, StubTokenizer  # noqa: E402
+
+FRAME_RATE = 16000
+
+
+def generate_audio(path: str, duration: float, seed: int = 0):
+    """
+    Генерация синтетического аудио: "фразы" длиной 1-15 с (шум, модулированный с частотой слогов ~4 Гц),
+    разделенные паузами 0.2-2 с. Аудио пишется блоками, чтобы не держать его целиком в памяти.
+    Args:
+        path (str): Путь до wav файла (16K mono).
+        duration (float): Длительность аудио в секундах.
+        seed (int): Seed генератора случайных чисел.
+    """
+    rng = np.random.default_rng(seed)
+    total_frames = int(duration * FRAME_RATE)
+    written_frames = 0
+    with wave.open(path, "wb") as file:
+        file.setnchannels(1)
+        file.setsampwidth(2)
+        file.setframerate(FRAME_RATE)
+        while written_frames < total_frames:
+            phrase_frames = int(rng.uniform(1, 15) * FRAME_RATE)
+            pause_frames = int(rng.uniform(0.2, 2) * FRAME_RATE)
+            time_axis = np.arange(phrase_frames) / FRAME_RATE
+            envelope = 0.5 * (1 + np.sin(2 * np.pi * rng.uniform(3, 5) * time_axis))
+            phrase = rng.normal(0, rng.uniform(0.05, 0.2), phrase_frames) * envelope
+            pause = rng.normal(0, 0.002, pause_frames)
+            block = np.concatenate((phrase, pause))[:total_frames - written_frames]
+            file.writeframes((np.clip(block, -1, 1) * 32767).astype(np.int16).tobytes())
+            written_frames += len(block)
+
+
+def measure(function: Callable[[], None], audio_duration: float) -> Dict:
+    """
+    Замер времени, пропускной способности (секунд аудио на секунду работы) и памяти для одного этапа.
+    peak_traced_mb - пик памяти, выделенной во время этапа (python и numpy), peak_rss_mb - пик RSS процесса
+    к концу этапа.
+    """
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    function()
+    wall_time = time.perf_counter() - start_time
+    _, peak_traced = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss = peak_rss / 2 ** 20 if sys.platform == "darwin" else peak_rss / 2 ** 10  # bytes on macOS, KB on linux
+    return {"wall_time": wall_time,
+            "throughput": audio_duration / wall_time if wall_time > 0 else None,
+            "peak_traced_mb": peak_traced / 2 ** 20,
+            "peak_rss_mb": peak_rss}
+
+
+def benchmark_stages(path2audio: str, duration: float, transcriber: Transcriber, max_chunk_duration: int) -> Dict:
+    """
+    Бенчмарк отдельных этапов и всего перевода аудио в текст для одного аудио.
+    """
+    results = {}
+    audio_splitter = Audio2Chunks(path2audio=path2audio, max_chunk_duration=max_chunk_duration)
+    results["load_audio"] = measure(audio_splitter.load_audio, duration)
+    results["get_chunks"] = measure(audio_splitter.get_chunks, duration)
+    results["get_chunks"]["num_chunks"] = len(audio_splitter.chunks)
+    results["save_chunks"] = measure(audio_splitter.save_chunks, duration)
+
+    sentences = [f"предложение номер {i} без пунктуации" if i % 3 else f"Предложение номер {i}."
+                 for i in range(len(audio_splitter.chunks) * 20)]
+    speller = SpellingCorrector(raw_sentences=[],
+                                device=transcriber.device,
+                                tokenizer=transcriber.tokenizer,
+                                model=transcriber.spelling_model)
+    speller.spelling_corrected_sentences = sentences
+    results["concatenate_sentences"] = measure(speller._concatenate_sentences, duration)
+    results["concatenate_sentences"]["num_sentences"] = len(sentences)
+    del audio_splitter
+
+    transcription_results = []
+    results["pipeline"] = measure(lambda: transcription_results.append(transcriber.transcribe(path2audio)), duration)
+    results["pipeline"]["stages"] = {"split_audio": transcription_results[0].split_audio_duration,
+                                     "transcription": transcription_results[0].transcription_duration,
+                                     "spelling_correction": transcription_results[0].spelling_correction_duration,
+                                     "spans": transcription_results[0].stages}
+    results["pipeline"]["counters"] = transcription_results[0].counters
+    return results
+
+
+def get_environment() -> Dict:
+    """
+    Описание окружения, чтобы результаты можно было сравнивать между коммитами и машинами.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"commit": commit,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "torch": torch.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "torch_threads": torch.get_num_threads()}
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Бенчмарк этапов SpeechRecognitionModule.")
+    parser.add_argument("--durations", type=float, nargs="+", default=[60, 600, 1800],
+                        help="Длительности синтетических аудио в секундах.")
+    parser.add_argument("--max-chunk-duration", type=int, default=150, help="Максимальная длительность чанка (s).")
+    parser.add_argument("--batch-size", type=int, default=16, help="Размер batch-а для ASR.")
+    parser.add_argument("--real-models", action="store_true",
+                        help="Использовать настоящие модели Nemo и T5 вместо легковесных замен.")
+    parser.add_argument("--asr-backend", default="eager", choices=ASR_BACKENDS, help="Бэкенд инференса ASR.")
+    parser.add_argument("--spelling-backend", default="eager", choices=SPELLING_BACKENDS,
+                        help="Бэкенд инференса исправления ошибок.")
+    parser.add_argument("--num-threads", type=int, default=None, help="Число потоков torch и ONNX Runtime.")
+    parser.add_argument("--output", default=None, help="Путь до JSON файла с результатами (по умолчанию stdout).")
+    args = parser.parse_args(argv)
+
+    device = torch.device("cpu")
+    models = {} if args.real_models else {"asr_model": StubASRModel(),
+                                          "tokenizer": StubTokenizer(),
+                                          "spelling_model": StubSpellingModel()}
+    transcriber = Transcriber(device,
+                              batch_size=args.batch_size,
+                              verbose=0,
+                              max_chunk_duration=args.max_chunk_duration,
+                              asr_backend=args.asr_backend,
+                              spelling_backend=args.spelling_backend,
+                              num_threads=args.num_threads,
+                              **models)
+
+    report = {"environment": get_environment(), "models": "real" if args.real_models else "stub",
+              "backends": {"asr": args.asr_backend, "spelling": args.spelling_backend}, "runs": []}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for duration in args.durations:
+            path2audio = os.path.join(tmp_dir, f"synthetic_{int(duration)}s.wav")
+            generate_audio(path2audio, duration)
+            report["runs"].append({"audio_duration": duration,
+                                   "stages": benchmark_stages(path2audio, duration, transcriber,
+                                                              args.max_chunk_duration)})
+            os.remove(path2audio)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output)
+
+
+if __name__ == "__main__":
+    main()
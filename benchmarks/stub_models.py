@@ -0,0 +1,215 @@
+"""
+Легковесные замены моделей Nemo и T5 для бенчмарков. Они повторяют интерфейсы, которые использует
+SpeechRecognitionModule, работают офлайн на CPU, а их время работы растет с длиной входа так же, как у
+настоящих моделей (линейно по длине аудио для ASR, по числу токенов и шагов генерации для T5).
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+import torch
+
+VOCABULARY = ["привет", "как", "дела", "сегодня", "мы", "обсудим", "план", "работы", "на", "неделю",
+              "хорошо", "давайте", "начнем", "с", "первого", "вопроса", "это", "важно", "для", "всех"]
+
+
+class _StubFeaturizer:
+    dither = 1e-5
+    pad_to = 16
+
+
+class _StubPreprocessor:
+    featurizer = _StubFeaturizer()
+
+
+class _StubHypothesis:
+    """
+    Замена Hypothesis из Nemo: текст, токены и номера кадров энкодера, на которых они выданы.
+    """
+
+    def __init__(self, text: str, y_sequence: List[int], timestep: List[int]):
+        self.text = text
+        self.y_sequence = torch.tensor(y_sequence, dtype=torch.long)
+        self.timestep = timestep
+
+
+class _StubTokenizer:
+    """
+    Замена токенизатора SentencePiece модели Nemo: токен - слово словаря с маркером начала слова.
+    """
+
+    def ids_to_tokens(self, ids: List[int]) -> List[str]:
+        return ["▁" + VOCABULARY[idx] for idx in ids]
+
+
+class _StubDecoding:
+    """
+    Декодирование: каждое слово соответствует ~8 кадрам (320 мс) с энергией выше порога и выдается
+    на первом из них.
+    """
+
+    def __init__(self, frames_per_word: int = 8, energy_thresh: float = 1e-4):
+        self.frames_per_word = frames_per_word
+        self.energy_thresh = energy_thresh
+
+    def rnnt_decoder_predictions_tensor(self,
+                                        encoder_output: torch.Tensor,
+                                        encoded_lengths: torch.Tensor,
+                                        return_hypotheses: bool = False,
+                                        **kwargs):
+        hypotheses = []
+        for energy, length in zip(encoder_output[:, :, 0], encoded_lengths):
+            voiced_frames = torch.nonzero(energy[:int(length)] > self.energy_thresh).flatten().tolist()
+            timestep = voiced_frames[::self.frames_per_word][:len(voiced_frames) // self.frames_per_word]
+            y_sequence = [i % len(VOCABULARY) for i in range(len(timestep))]
+            hypotheses.append(_StubHypothesis(" ".join(VOCABULARY[idx] for idx in y_sequence), y_sequence, timestep))
+        if return_hypotheses:
+            return hypotheses, None
+        return [hypothesis.text for hypothesis in hypotheses], None
+
+
+class _StubEncoder(torch.nn.Module):
+    """
+    "Энкодер" - линейный слой над кадрами по 40 мс (как после subsampling в conformer). Первый канал выхода -
+    энергия кадра. Поддерживает export (как Exportable в Nemo) в TorchScript (.ts) и ONNX (.onnx).
+    """
+
+    def __init__(self, frame_size: int, hidden_size: int):
+        super().__init__()
+        self.frame_size = frame_size
+        self.linear = torch.nn.Linear(frame_size, hidden_size)
+
+    def forward(self, audio_signal: torch.Tensor, length: torch.Tensor):
+        num_frames = audio_signal.shape[1] // self.frame_size
+        frames = audio_signal[:, :num_frames * self.frame_size].reshape(audio_signal.shape[0], num_frames, -1)
+        hidden = self.linear(frames)
+        energy = frames.pow(2).mean(dim=2, keepdim=True)
+        return torch.cat((energy, hidden), dim=2), length // self.frame_size
+
+    def export(self, output: str):
+        input_example = (torch.randn(2, self.frame_size * 10), torch.tensor([self.frame_size * 10, self.frame_size]))
+        if output.endswith(".ts"):
+            torch.jit.trace(self, input_example).save(output)
+        else:
+            torch.onnx.export(self, input_example, output,
+                              input_names=["audio_signal", "length"],
+                              output_names=["outputs", "encoded_lengths"],
+                              dynamic_axes={"audio_signal": {0: "batch", 1: "time"}, "length": {0: "batch"}})
+
+
+class StubASRModel(torch.nn.Module):
+    """
+    Замена EncDecRNNTBPEModel: энкодер (_StubEncoder) вызывается так же, как в Nemo, поэтому его можно квантовать
+    или заменять на экспортированный (см. SpeechRecognitionModule/backends.py).
+    """
+
+    def __init__(self, frame_size: int = 640, hidden_size: int = 256):
+        super().__init__()
+        self.frame_size = frame_size
+        self.encoder = _StubEncoder(frame_size, hidden_size)
+        self.preprocessor = _StubPreprocessor()
+        self.decoding = _StubDecoding()
+        self.tokenizer = _StubTokenizer()
+
+    def forward(self, input_signal: torch.Tensor, input_signal_length: torch.Tensor):
+        return self.encoder(audio_signal=input_signal, length=input_signal_length)
+
+    def transcribe(self, paths2audio_files: List[str], batch_size: int = 4, return_hypotheses: bool = False):
+        import wave
+
+        texts = []
+        for batch_start in range(0, len(paths2audio_files), batch_size):
+            signals = []
+            for path in paths2audio_files[batch_start: batch_start + batch_size]:
+                with wave.open(path, "rb") as file:
+                    signals.append(np.frombuffer(file.readframes(file.getnframes()), dtype=np.int16) / 32768)
+            lengths = torch.tensor([len(signal) for signal in signals])
+            signal = torch.zeros(len(signals), int(lengths.max()))
+            for row, samples in enumerate(signals):
+                signal[row, :len(samples)] = torch.from_numpy(samples)
+            with torch.no_grad():
+                encoded, encoded_len = self.forward(input_signal=signal, input_signal_length=lengths)
+            texts.extend(self.decoding.rnnt_decoder_predictions_tensor(encoded, encoded_len, return_hypotheses)[0])
+        return texts, None
+
+
+class StubBatchEncoding(dict):
+    """
+    Замена transformers.BatchEncoding.
+    """
+
+    def to(self, device):
+        return StubBatchEncoding({key: value.to(device) for key, value in self.items()})
+
+
+class StubTokenizer:
+    """
+    Замена T5TokenizerFast: токен - слово (словарь пополняется на лету), 0 - padding, 1 - конец последовательности.
+    """
+
+    def __init__(self):
+        self.vocab: Dict[str, int] = {}
+        self.words: List[str] = ["<pad>", "</s>"]
+
+    def _encode(self, text: str, add_special_tokens: bool) -> List[int]:
+        input_ids = []
+        for word in text.split():
+            if word not in self.vocab:
+                self.vocab[word] = len(self.words)
+                self.words.append(word)
+            input_ids.append(self.vocab[word])
+        return input_ids + [1] if add_special_tokens else input_ids
+
+    def __call__(self,
+                 texts: List[str],
+                 padding: Optional[str] = None,
+                 max_length: Optional[int] = None,
+                 truncation: bool = False,
+                 return_tensors: Optional[str] = None,
+                 add_special_tokens: bool = True):
+        input_ids = [self._encode(text, add_special_tokens) for text in texts]
+        if truncation and max_length is not None:
+            input_ids = [ids[:max_length] for ids in input_ids]
+        if return_tensors != "pt":
+            return {"input_ids": input_ids}
+
+        longest = max(len(ids) for ids in input_ids)
+        padded = torch.zeros(len(input_ids), longest, dtype=torch.long)
+        for row, ids in enumerate(input_ids):
+            padded[row, :len(ids)] = torch.tensor(ids)
+        return StubBatchEncoding({"input_ids": padded, "attention_mask": (padded != 0).long()})
+
+    def batch_decode(self, predicts: torch.Tensor, skip_special_tokens: bool = True) -> List[str]:
+        texts = []
+        for ids in predicts.tolist():
+            words = [self.words[idx] for idx in ids if idx > 1]
+            text = " ".join(words)
+            texts.append(text[:1].upper() + text[1:] + "." if text else text)
+        return texts
+
+
+class StubSpellingModel(torch.nn.Module):
+    """
+    Замена T5: "генерация" копирует вход без префикса задачи, выполняя по одному шагу декодера
+    (линейный слой над batch-ем) на каждый выходной токен.
+    """
+
+    def __init__(self, task_prefix_len: int = 2, hidden_size: int = 512):
+        super().__init__()
+        self.task_prefix_len = task_prefix_len
+        self.decoder_step = torch.nn.Linear(hidden_size, hidden_size)
+        self.hidden_size = hidden_size
+
+    def generate(self,
+                 input_ids: torch.Tensor,
+                 attention_mask: Optional[torch.Tensor] = None,
+                 max_new_tokens: Optional[int] = None,
+                 num_beams: int = 1,
+                 **kwargs):
+        output_len = input_ids.shape[1] - self.task_prefix_len
+        if max_new_tokens is not None:
+            output_len = min(output_len, max_new_tokens)
+        with torch.no_grad():
+            hidden = torch.zeros(input_ids.shape[0] * num_beams, input_ids.shape[1], self.hidden_size)
+            for _ in range(output_len):
+                hidden = torch.tanh(self.decoder_step(hidden))
+        return input_ids[:, self.task_prefix_len: self.task_prefix_len + output_len]
@@ -10,7 +10,8 @@ device = torch.device("cuda") if torch.cuda.is_available() else torch.device("cp
 verbose = 2  # 0 = just output, 1 = output + time stats, 2 = output + time stats + all in-between outputs
 
 # Getting text from audio
-output_text = speech2text(path2audio,
-                          device,
-                          verbose=2)
-print(output_text)
+result = speech2text(path2audio,
+                     device,
+                     verbose=2)
+print(result.text)
+print(result.stages)  # time per stage: decode, silence_detection, asr_batch, t5_batch
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Замены моделей (stub_models.py) и генератор синтетического аудио лежат в benchmarks
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
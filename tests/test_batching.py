@@ -0,0 +1,120 @@
+"""
+Проверка DynamicBatcher и transcribe_async на заменах моделей из benchmarks/stub_models.py.
+"""
+import asyncio
+import time
+
+import torch
+
+from run_benchmarks import generate_audio
+from stub_models import StubASRModel, StubSpellingModel, StubTokenizer
+from SpeechRecognitionModule.batching import DynamicBatcher
+from SpeechRecognitionModule.transcribe import Transcriber
+
+
+class StubSpeller:
+    """
+    Функция обработки batch-а предложений заменой T5, запоминающая размеры batch-ей.
+    """
+
+    def __init__(self, fail_on: str = None):
+        self.tokenizer = StubTokenizer()
+        self.model = StubSpellingModel(task_prefix_len=1)
+        self.batch_sizes = []
+        self.fail_on = fail_on
+
+    def __call__(self, sentences):
+        self.batch_sizes.append(len(sentences))
+        if self.fail_on in sentences:
+            raise ValueError(f"cannot correct {self.fail_on}")
+        encoded = self.tokenizer(["fix: " + sentence for sentence in sentences], padding="longest",
+                                 return_tensors="pt", add_special_tokens=False)
+        return self.tokenizer.batch_decode(self.model.generate(**encoded))
+
+
+def test_concurrent_items_are_coalesced_into_batches():
+    speller = StubSpeller()
+
+    async def run():
+        batcher = DynamicBatcher(speller, max_batch_size=4, max_wait_ms=50)
+        results = await asyncio.gather(*(batcher.submit(f"слово {i}") for i in range(10)))
+        await batcher.close()
+        return batcher, results
+
+    batcher, results = asyncio.run(run())
+    assert results == [f"Слово {i}." for i in range(10)]
+    assert speller.batch_sizes == [4, 4, 2]
+    assert (batcher.num_batches, batcher.num_items) == (3, 10)
+
+
+def test_partial_batch_is_sent_after_max_wait():
+    speller = StubSpeller()
+
+    async def run():
+        batcher = DynamicBatcher(speller, max_batch_size=16, max_wait_ms=20)
+        start_time = time.perf_counter()
+        first = await batcher.submit("первое")
+        elapsed = time.perf_counter() - start_time
+        second = await batcher.submit("второе")
+        await batcher.close()
+        return first, second, elapsed
+
+    first, second, elapsed = asyncio.run(run())
+    assert (first, second) == ("Первое.", "Второе.")
+    assert speller.batch_sizes == [1, 1]
+    assert elapsed < 1.0
+
+
+def test_cancelled_items_are_not_processed():
+    speller = StubSpeller()
+
+    async def run():
+        batcher = DynamicBatcher(speller, max_batch_size=8, max_wait_ms=50)
+        cancelled = asyncio.ensure_future(batcher.submit("отменено"))
+        kept = asyncio.ensure_future(batcher.submit("оставлено"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        result = await kept
+        await batcher.close()
+        return cancelled, result
+
+    cancelled, result = asyncio.run(run())
+    assert cancelled.cancelled()
+    assert result == "Оставлено."
+    assert speller.batch_sizes == [1]
+
+
+def test_errors_are_propagated_to_the_whole_batch():
+    speller = StubSpeller(fail_on="плохое")
+
+    async def run():
+        batcher = DynamicBatcher(speller, max_batch_size=8, max_wait_ms=50)
+        failed = await asyncio.gather(batcher.submit("плохое"), batcher.submit("хорошее"), return_exceptions=True)
+        after_error = await batcher.submit("следующее")
+        await batcher.close()
+        return failed, after_error
+
+    failed, after_error = asyncio.run(run())
+    assert all(isinstance(error, ValueError) for error in failed)
+    assert after_error == "Следующее."
+
+
+def test_transcribe_async_matches_transcribe(tmp_path):
+    paths2audio = []
+    for seed in range(3):
+        path2audio = str(tmp_path / f"audio_{seed}.wav")
+        generate_audio(path2audio, duration=30, seed=seed)
+        paths2audio.append(path2audio)
+    transcriber = Transcriber(torch.device("cpu"), verbose=0, max_chunk_duration=10, max_wait_ms=50,
+                              asr_model=StubASRModel(), tokenizer=StubTokenizer(), spelling_model=StubSpellingModel())
+    expected = [result.text for result in transcriber.transcribe_many(paths2audio)]
+
+    async def run():
+        results = await asyncio.gather(*(transcriber.transcribe_async(path) for path in paths2audio))
+        asr_batcher = transcriber._asr_batcher
+        await transcriber.aclose()
+        return [result.text for result in results], asr_batcher
+
+    texts, asr_batcher = asyncio.run(run())
+    assert texts == expected
+    assert asr_batcher.num_batches < asr_batcher.num_items
@@ -0,0 +1,73 @@
+"""
+Проверка совпадения векторизованного поиска тишины с pydub.silence.detect_silence.
+"""
+import numpy as np
+import pytest
+from pydub import AudioSegment
+from pydub.silence import detect_silence
+
+from SpeechRecognitionModule.silence import SilenceDetector, ms_to_frame
+
+FRAME_RATE = 16000
+
+
+def make_audio(duration: float = 4.0, seed: int = 0) -> np.ndarray:
+    """
+    16 bit сигнал из чередующихся "речи" (шум разной громкости) и пауз (тихий шум) случайной длины.
+    """
+    rng = np.random.default_rng(seed)
+    parts = []
+    while sum(len(part) for part in parts) < duration * FRAME_RATE:
+        speech_len = int(rng.uniform(0.1, 0.8) * FRAME_RATE)
+        pause_len = int(rng.uniform(0.05, 0.6) * FRAME_RATE)
+        parts.append(rng.normal(0, rng.uniform(1000, 8000), speech_len))
+        parts.append(rng.normal(0, 20, pause_len))
+    signal = np.concatenate(parts)[:int(duration * FRAME_RATE)]
+    return np.clip(np.rint(signal), -32768, 32767).astype(np.int16)
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+@pytest.mark.parametrize("min_silence_len,silence_thresh", [(100, -40), (300, -36), (50, -60)])
+def test_detect_silence_matches_pydub(seed, min_silence_len, silence_thresh):
+    pcm = make_audio(seed=seed)
+    audio = AudioSegment(pcm.tobytes(), frame_rate=FRAME_RATE, sample_width=2, channels=1)
+    detector = SilenceDetector(pcm.astype(np.float32) / 32768, frame_rate=FRAME_RATE)
+
+    expected = detect_silence(audio, min_silence_len=min_silence_len, silence_thresh=silence_thresh, seek_step=1)
+    assert detector.detect_silence(0, len(pcm), min_silence_len, silence_thresh) == expected
+
+
+def test_detect_silence_on_subsegment_matches_pydub():
+    pcm = make_audio(seed=2)
+    audio = AudioSegment(pcm.tobytes(), frame_rate=FRAME_RATE, sample_width=2, channels=1)
+    detector = SilenceDetector(pcm.astype(np.float32) / 32768, frame_rate=FRAME_RATE)
+
+    start_ms, end_ms = 1234, 3217
+    start = ms_to_frame(start_ms, len(pcm), FRAME_RATE)
+    end = ms_to_frame(end_ms, len(pcm), FRAME_RATE)
+    expected = detect_silence(audio[start_ms:end_ms], min_silence_len=150, silence_thresh=-40, seek_step=1)
+    assert detector.detect_silence(start, end, 150, -40) == expected
+    assert detector.dbfs(start, end) == pytest.approx(audio[start_ms:end_ms].dBFS)
+
+
+def test_detect_silence_is_independent_of_slab_size(monkeypatch):
+    pcm = make_audio(seed=3)
+    samples = pcm.astype(np.float32) / 32768
+    expected = SilenceDetector(samples, frame_rate=FRAME_RATE).detect_silence(0, len(pcm), 100, -40)
+    assert expected
+
+    monkeypatch.setattr("SpeechRecognitionModule.silence.SLAB_SIZE", 97)
+    assert SilenceDetector(samples, frame_rate=FRAME_RATE).detect_silence(0, len(pcm), 100, -40) == expected
+
+
+def test_append_and_discard_match_detector_built_from_scratch():
+    samples = make_audio(seed=4).astype(np.float32) / 32768
+    detector = SilenceDetector(samples[:0], frame_rate=FRAME_RATE)
+    for block_start in range(0, 24000, 1601):
+        detector.append(samples[block_start: block_start + 1601])
+    for discarded in (160, 1234):  # по границе блока и внутри блока
+        detector.discard(discarded)
+        expected = SilenceDetector(detector.samples.copy(), frame_rate=FRAME_RATE)
+        np.testing.assert_array_equal(detector.cumulative_energy, expected.cumulative_energy)
+        silence = detector.detect_silence(0, detector.num_frames, 100, -40)
+        assert silence == expected.detect_silence(0, expected.num_frames, 100, -40)
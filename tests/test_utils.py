@@ -0,0 +1,10 @@
+"""
+Проверка склейки исправленных предложений.
+"""
+from SpeechRecognitionModule.utils import concatenate_sentences
+
+
+def test_concatenate_sentences_skips_empty_sentences():
+    expected = concatenate_sentences(["Привет.", "как дела?"])
+    assert concatenate_sentences(["", "Привет.", "", "как дела?", ""]) == expected
+    assert concatenate_sentences(["", ""]) == ""